@@ -1,9 +1,29 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
-import sqlite3
-import json
-import random
-from datetime import datetime
+import logging
+import os
+import time
+
+from background import BackgroundExecutor
+from database import DB_PATH, get_engine
+from grading import grade_answers, grade_for
+from knowledge_base import get_knowledge_base, plain_text
+from progress import DEFAULT_USER, PRACTICE_MODE, QUIZ_MODE, get_or_create_user
+from question_bank import seed_question_bank
+from queries import SAMPLE_QUESTIONS, TOPIC_PROGRESS, TOPIC_PROGRESS_ROW
+from question_cursor import QuestionCursor, fetch_after, fetch_before
+from quiz_assembler import assemble_quiz
+from response_cache import response_cache
+from retrieval import get_index
+from submission_queue import get_submission_writer
+
+logger = logging.getLogger(__name__)
+
+# Progress rows are added to the tree in windows of this size as the user scrolls
+PROGRESS_WINDOW = 200
+
+# Number of retrieved passages in an assistant answer
+RESPONSE_PASSAGES = 3
 
 class AIQuizGenerator:
     def __init__(self, root):
@@ -11,242 +31,66 @@ class AIQuizGenerator:
         self.root.title("AI Based Quiz Generator - Pumps and Compressors")
         self.root.geometry("1200x800")
         
+        # Startup phases, reported once the first frame has been drawn
+        self.startup_start = time.perf_counter()
+        self.startup_marks = []
+        
         # Database setup
         self.setup_database()
+        self.mark_startup("database")
+        
+        # Database and assistant calls run on worker threads
+        self.create_status_bar()
+        self.worker = BackgroundExecutor(self.root, self.engine.connection, on_busy=self.set_busy)
         
-        # Create main interface
+        # Create main interface; each tab is built the first time it is shown
         self.create_main_interface()
+        self.mark_startup("interface")
         
-        # Load initial data
-        self.load_quiz_topics()
+        self.root.after_idle(self.report_startup)
+    
+    def mark_startup(self, phase):
+        """Record the time elapsed since startup for a phase"""
+        self.startup_marks.append((phase, (time.perf_counter() - self.startup_start) * 1000))
+    
+    def report_startup(self):
+        """Log how long each startup phase took, ending with the first paint"""
+        self.root.update_idletasks()
+        self.mark_startup("first paint")
+        report = ", ".join(f"{phase} {elapsed:.1f} ms" for phase, elapsed in self.startup_marks)
+        logger.info("Startup: %s", report)
     
     def setup_database(self):
-        """Initialize SQLite database with course structure"""
-        self.conn = sqlite3.connect('pumps_compressors.db')
-        self.cursor = self.conn.cursor()
-        
-        # Create tables
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS topics (
-                id INTEGER PRIMARY KEY,
-                week INTEGER,
-                day INTEGER,
-                title TEXT,
-                description TEXT,
-                pcs TEXT,
-                content TEXT
-            )
-        ''')
-        
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS quizzes (
-                id INTEGER PRIMARY KEY,
-                topic_id INTEGER,
-                question TEXT,
-                options TEXT,
-                correct_answer TEXT,
-                question_type TEXT,
-                FOREIGN KEY (topic_id) REFERENCES topics (id)
-            )
-        ''')
-        
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_progress (
-                id INTEGER PRIMARY KEY,
-                topic_id INTEGER,
-                quiz_score REAL,
-                completed BOOLEAN,
-                timestamp DATETIME,
-                FOREIGN KEY (topic_id) REFERENCES topics (id)
-            )
-        ''')
-        
-        # Insert sample data if empty
-        self.insert_sample_data()
-        self.conn.commit()
+        """Open the course database and apply any pending schema migrations"""
+        # The engine migrates the schema and syncs the bundled question bank
+        self.engine = get_engine(DB_PATH, seed=seed_question_bank)
+        with self.engine.connection() as conn:
+            self.user_id = get_or_create_user(conn.cursor(), DEFAULT_USER)
+            conn.commit()
+        
+        # Submissions are written in batches by a background writer
+        self.submissions = get_submission_writer(DB_PATH)
     
-    def insert_sample_data(self):
-        """Insert course topics and quizzes based on the provided materials"""
+    def create_status_bar(self):
+        """Status line with a spinner shown while background work runs"""
+        status_frame = ttk.Frame(self.root)
+        status_frame.pack(side='bottom', fill='x', padx=10, pady=(0, 5))
         
-        # Check if data already exists
-        self.cursor.execute("SELECT COUNT(*) FROM topics")
-        if self.cursor.fetchone()[0] > 0:
-            return
+        self.status_label = ttk.Label(status_frame, text="", font=('Arial', 9))
+        self.status_label.pack(side='left')
         
-        # Topics data based on the course structure
-        topics_data = [
-            (1, 1, "Pump Types and Fundamentals", 
-             "Centrifugal and Positive Displacement Pumps",
-             "PC1.1, PC2.3, PC2.4",
-             "Basic principles, construction, and applications of different pump types."),
-            
-            (2, 2, "Compressor Types and Components", 
-             "Centrifugal and Positive Displacement Compressors",
-             "PC1.1, PC2.1, PC2.2",
-             "Compressor types, components, and operating principles."),
-            
-            (3, 3, "Measurement Devices", 
-             "Pressure, Flow, and Temperature Measurement",
-             "PC4.1, PC1.2",
-             "Measurement devices including pressure gauges, transducers, and Venturi tubes."),
-            
-            (4, 4, "Safety Procedures", 
-             "Startup, Shutdown and Safety Protocols",
-             "PC1.3, PC3.1",
-             "Safe operation procedures and common fault diagnosis."),
-            
-            (5, 5, "Cavitation and Pump Safety", 
-             "Pressure Management and Cavitation Effects",
-             "PC3.2, PC3.3",
-             "Cavitation causes, effects, and prevention methods."),
-            
-            (6, 7, "Performance Calculations", 
-             "Power, Efficiency and Performance Analysis",
-             "PC4.2, PC4.3, PC4.4, PC4.5, PC4.6",
-             "Power calculations, efficiency curves, and performance analysis."),
-        ]
-        
-        # Insert topics
-        for topic in topics_data:
-            self.cursor.execute(
-                "INSERT INTO topics (week, day, title, description, pcs, content) VALUES (?, ?, ?, ?, ?, ?)",
-                topic
-            )
-        
-        # Insert extensive quiz questions
-        quiz_data = [
-            # Pump Fundamentals (Topic 1)
-            (1, "Which pump type uses an impeller to move fluid?", 
-             '["Centrifugal Pump", "Piston Pump", "Gear Pump", "Diaphragm Pump"]', 
-             "Centrifugal Pump", "multiple_choice"),
-            
-            (1, "What is the main function of a pump?", 
-             '["Increase fluid pressure", "Generate electricity", "Cool the fluid", "Filter contaminants"]', 
-             "Increase fluid pressure", "multiple_choice"),
-            
-            (1, "Which component in a centrifugal pump converts velocity energy to pressure energy?", 
-             '["Impeller", "Volute Casing", "Shaft", "Seal"]', 
-             "Volute Casing", "multiple_choice"),
-            
-            (1, "What type of pump is best for high viscosity fluids?", 
-             '["Centrifugal Pump", "Positive Displacement Pump", "Jet Pump", "Turbine Pump"]', 
-             "Positive Displacement Pump", "multiple_choice"),
-            
-            (1, "The efficiency of a centrifugal pump is highest at:", 
-             '["Best Efficiency Point (BEP)", "Shut-off head", "Run-out point", "All operating points"]', 
-             "Best Efficiency Point (BEP)", "multiple_choice"),
-            
-            # Compressors (Topic 2)
-            (2, "Which compressor type is best for high-pressure applications?", 
-             '["Centrifugal Compressor", "Rotary Screw Compressor", "Reciprocating Compressor", "Axial Compressor"]', 
-             "Reciprocating Compressor", "multiple_choice"),
-            
-            (2, "What is the purpose of an intercooler in a multi-stage compressor?", 
-             '["Reduce power consumption", "Increase final pressure", "Cool the gas between stages", "Lubricate moving parts"]', 
-             "Cool the gas between stages", "multiple_choice"),
-            
-            (2, "Which compressor type provides continuous, pulsation-free flow?", 
-             '["Reciprocating Compressor", "Centrifugal Compressor", "Diaphragm Compressor", "Rotary Vane Compressor"]', 
-             "Centrifugal Compressor", "multiple_choice"),
-            
-            (2, "The clearance volume in a reciprocating compressor affects:", 
-             '["Volumetric efficiency", "Motor speed", "Lubrication requirements", "Noise level"]', 
-             "Volumetric efficiency", "multiple_choice"),
-            
-            (2, "What safety device is essential on all air compressor receivers?", 
-             '["Pressure relief valve", "Temperature gauge", "Flow meter", "Moisture separator"]', 
-             "Pressure relief valve", "multiple_choice"),
-            
-            # Measurement Devices (Topic 3)
-            (3, "What does a Venturi tube measure?", 
-             '["Pressure", "Temperature", "Flow rate", "Viscosity"]', 
-             "Flow rate", "multiple_choice"),
-            
-            (3, "Which device converts pressure into an electrical signal?", 
-             '["Pressure Gauge", "Pressure Transducer", "Manometer", "Bourdon Tube"]', 
-             "Pressure Transducer", "multiple_choice"),
-            
-            (3, "What principle does a Venturi tube operate on?", 
-             '["Bernoulli\'s principle", "Pascal\'s principle", "Archimedes\' principle", "Newton\'s law"]', 
-             "Bernoulli\'s principle", "multiple_choice"),
-            
-            (3, "Which temperature sensor uses resistance change with temperature?", 
-             '["Thermocouple", "RTD", "Bimetallic strip", "Infrared sensor"]', 
-             "RTD", "multiple_choice"),
-            
-            (3, "A Bourdon tube is typically used in:", 
-             '["Flow meters", "Pressure gauges", "Temperature sensors", "Level indicators"]', 
-             "Pressure gauges", "multiple_choice"),
-            
-            # Safety Procedures (Topic 4)
-            (4, "What should you check before starting a pump?", 
-             '["Lubrication levels", "Weather conditions", "Operator certification", "Manufacturer name"]', 
-             "Lubrication levels", "multiple_choice"),
-            
-            (4, "The correct sequence for pump startup is:", 
-             '["Open discharge, start pump, open suction", "Start pump, open suction, open discharge", "Open suction, start pump, open discharge", "Open suction, open discharge, start pump"]', 
-             "Open suction, start pump, open discharge", "multiple_choice"),
-            
-            (4, "What is the purpose of a safety valve?", 
-             '["Control flow rate", "Measure pressure", "Prevent overpressure", "Indicate temperature"]', 
-             "Prevent overpressure", "multiple_choice"),
-            
-            (4, "Lockout-Tagout procedures are used for:", 
-             '["Increasing efficiency", "Energy isolation during maintenance", "Speed control", "Performance testing"]', 
-             "Energy isolation during maintenance", "multiple_choice"),
-            
-            (4, "Before working on a pump, you should:", 
-             '["Drain the fluid", "Increase pressure", "Run at maximum speed", "Check weather forecast"]', 
-             "Drain the fluid", "multiple_choice"),
-            
-            # Cavitation (Topic 5)
-            (5, "What causes cavitation in pumps?", 
-             '["High suction pressure", "Low suction pressure", "High discharge pressure", "Low fluid viscosity"]', 
-             "Low suction pressure", "multiple_choice"),
-            
-            (5, "The formation and collapse of vapor bubbles in a pump is called:", 
-             '["Aeration", "Cavitation", "Turbulence", "Laminar flow"]', 
-             "Cavitation", "multiple_choice"),
-            
-            (5, "What does NPSH stand for?", 
-             '["Net Positive Suction Head", "Negative Pressure System Head", "Normal Pump Suction Height", "National Pump Safety Handbook"]', 
-             "Net Positive Suction Head", "multiple_choice"),
-            
-            (5, "Which symptom indicates cavitation?", 
-             '["Smooth operation", "Reduced noise", "Knocking sounds", "Increased flow"]', 
-             "Knocking sounds", "multiple_choice"),
-            
-            (5, "To prevent cavitation, you should:", 
-             '["Increase suction lift", "Reduce NPSH available", "Increase fluid temperature", "Reduce suction line restrictions"]', 
-             "Reduce suction line restrictions", "multiple_choice"),
-            
-            # Performance Calculations (Topic 6)
-            (6, "What is the formula for pump efficiency?", 
-             '["(Output Power / Input Power) × 100%", "(Input Power / Output Power) × 100%", "Output Power - Input Power", "Input Power × Output Power"]', 
-             "(Output Power / Input Power) × 100%", "multiple_choice"),
-            
-            (6, "Hydraulic power is calculated using:", 
-             '["Flow rate and pressure", "Speed and torque", "Voltage and current", "Temperature and density"]', 
-             "Flow rate and pressure", "multiple_choice"),
-            
-            (6, "The pressure ratio in compressors is defined as:", 
-             '["P1/P2", "P2/P1", "(P1+P2)/2", "P2-P1"]', 
-             "P2/P1", "multiple_choice"),
-            
-            (6, "What does a pump characteristic curve show?", 
-             '["Pump performance at different flow rates", "Pump material composition", "Pump manufacturing date", "Pump cost analysis"]', 
-             "Pump performance at different flow rates", "multiple_choice"),
-            
-            (6, "Volumetric efficiency in compressors compares:", 
-             '["Actual flow to theoretical flow", "Input power to output power", "Pressure ratio to temperature ratio", "Speed to torque"]', 
-             "Actual flow to theoretical flow", "multiple_choice"),
-        ]
-        
-        for quiz in quiz_data:
-            self.cursor.execute(
-                "INSERT INTO quizzes (topic_id, question, options, correct_answer, question_type) VALUES (?, ?, ?, ?, ?)",
-                quiz
-            )
+        self.spinner = ttk.Progressbar(status_frame, mode='indeterminate', length=120)
+    
+    def set_busy(self, busy):
+        """Start or stop the spinner"""
+        if busy:
+            self.status_label.config(text="Working...")
+            self.spinner.pack(side='right')
+            self.spinner.start(10)
+        else:
+            self.status_label.config(text="")
+            self.spinner.stop()
+            self.spinner.pack_forget()
     
     def create_main_interface(self):
         """Create the main user interface"""
@@ -264,10 +108,26 @@ class AIQuizGenerator:
         self.notebook.add(self.ai_assistant_frame, text="AI Learning Assistant")
         self.notebook.add(self.progress_frame, text="Progress Tracking")
         
-        # Setup each frame
-        self.setup_quiz_frame()
-        self.setup_ai_assistant_frame()
-        self.setup_progress_frame()
+        # Tabs are built, and their data fetched, on first selection
+        self.tab_builders = {
+            str(self.quiz_frame): self.setup_quiz_frame,
+            str(self.ai_assistant_frame): self.setup_ai_assistant_frame,
+            str(self.progress_frame): self.setup_progress_frame,
+        }
+        self.built_tabs = set()
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+        self.on_tab_changed()
+    
+    def on_tab_changed(self, event=None):
+        """Build the selected tab if this is the first time it is shown"""
+        tab = self.notebook.select()
+        if tab in self.built_tabs or tab not in self.tab_builders:
+            return
+        self.built_tabs.add(tab)
+        start = time.perf_counter()
+        self.tab_builders[tab]()
+        logger.info("Built tab %s in %.1f ms",
+                    self.notebook.tab(tab, 'text'), (time.perf_counter() - start) * 1000)
     
     def setup_quiz_frame(self):
         """Setup the quiz interface"""
@@ -298,6 +158,11 @@ class AIQuizGenerator:
         self.quiz_info = ttk.Label(selection_frame, text="", font=('Arial', 10))
         self.quiz_info.grid(row=1, column=0, columnspan=2, sticky='w', pady=2)
         
+        # Practice mode walks every question of the topic, graded as you go
+        self.practice_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(selection_frame, text="Practice mode (all questions)", variable=self.practice_var,
+                        command=self.load_quiz_questions).grid(row=2, column=0, columnspan=2, sticky='w', pady=2)
+        
         selection_frame.columnconfigure(1, weight=1)
         
         # Quiz area
@@ -320,7 +185,21 @@ class AIQuizGenerator:
         self.quiz_options_frame = tk.Frame(quiz_area_frame, bg='white')
         self.quiz_options_frame.pack(fill='x', pady=10, padx=10)
         
-        self.quiz_answer_var = tk.StringVar()
+        # Reusable option widgets; grown only when a question needs more
+        self.option_buttons = []
+        self.visible_options = 0
+        
+        # Debug overlay with per-navigation render time (F12 or QUIZ_DEBUG=1)
+        self.render_times = []
+        self.debug_overlay = tk.Label(quiz_area_frame, text="", font=('Courier', 9),
+                                      bg='#222222', fg='#00ff00')
+        self.debug_overlay_visible = False
+        self.root.bind('<F12>', self.toggle_debug_overlay)
+        if os.environ.get('QUIZ_DEBUG'):
+            self.toggle_debug_overlay()
+        
+        # Index of the selected option, -1 when nothing is selected
+        self.quiz_answer_var = tk.IntVar(value=-1)
         
         # Navigation buttons
         nav_frame = ttk.Frame(quiz_area_frame)
@@ -340,9 +219,14 @@ class AIQuizGenerator:
         # Load topic names for quiz selection
         self.load_quiz_topics()
         
+        self.current_quiz = None
         self.current_quiz_questions = []
         self.current_question_index = 0
         self.user_quiz_answers = {}
+        
+        # Practice mode state: a paged cursor and answers keyed by question id
+        self.practice = None
+        self.practice_answers = {}
     
     def setup_ai_assistant_frame(self):
         """Setup the AI assistant interface"""
@@ -422,11 +306,18 @@ class AIQuizGenerator:
             self.progress_tree.column(col, width=column_widths.get(col, 100))
         
         # Add scrollbar
-        scrollbar = ttk.Scrollbar(tree_frame, orient='vertical', command=self.progress_tree.yview)
-        self.progress_tree.configure(yscrollcommand=scrollbar.set)
+        self.progress_scrollbar = ttk.Scrollbar(tree_frame, orient='vertical', command=self.progress_tree.yview)
+        self.progress_tree.configure(yscrollcommand=self.on_progress_scroll)
         
         self.progress_tree.pack(side='left', fill='both', expand=True)
-        scrollbar.pack(side='right', fill='y')
+        self.progress_scrollbar.pack(side='right', fill='y')
+        
+        # Progress model keyed by topic id; only the first progress_rendered
+        # topics of progress_order exist as tree items
+        self.progress_rows = {}
+        self.progress_order = []
+        self.progress_rendered = 0
+        self.progress_totals = {'completed': 0, 'score_sum': 0.0, 'scored': 0}
         
         # Progress summary
         summary_frame = ttk.Frame(main_frame)
@@ -441,9 +332,15 @@ class AIQuizGenerator:
     
     def load_quiz_topics(self):
         """Load topics for quiz selection"""
-        self.cursor.execute("SELECT id, title, description FROM topics")
-        topics = self.cursor.fetchall()
-        
+        self.worker.submit(
+            lambda conn, task: conn.execute("SELECT id, title, description FROM topics").fetchall(),
+            on_done=self.show_quiz_topics,
+            on_error=self.show_load_error,
+            channel='quiz_topics'
+        )
+    
+    def show_quiz_topics(self, topics):
+        """Fill the quiz topic selector"""
         self.quiz_topic_data = {}
         topic_names = []
         for topic_id, title, description in topics:
@@ -458,9 +355,15 @@ class AIQuizGenerator:
     
     def load_ai_topics(self):
         """Load topics for AI assistant"""
-        self.cursor.execute("SELECT id, title FROM topics")
-        topics = self.cursor.fetchall()
-        
+        self.worker.submit(
+            lambda conn, task: conn.execute("SELECT id, title FROM topics").fetchall(),
+            on_done=self.show_ai_topics,
+            on_error=self.show_load_error,
+            channel='ai_topics'
+        )
+    
+    def show_ai_topics(self, topics):
+        """Fill the assistant topic selector"""
         self.ai_topic_data = {}
         topic_names = []
         for topic_id, title in topics:
@@ -482,12 +385,15 @@ class AIQuizGenerator:
         topic_id = self.ai_topic_data[topic_name]
         
         # Get questions for this topic
-        self.cursor.execute(
-            "SELECT question FROM quizzes WHERE topic_id=? LIMIT 8", 
-            (topic_id,)
+        self.worker.submit(
+            lambda conn, task: conn.execute(SAMPLE_QUESTIONS, (topic_id, 8)).fetchall(),
+            on_done=lambda questions: self.show_sample_questions(topic_name, questions),
+            on_error=self.show_load_error,
+            channel='samples'
         )
-        questions = self.cursor.fetchall()
-        
+    
+    def show_sample_questions(self, topic_name, questions):
+        """Display the sample questions for a topic"""
         self.sample_questions_text.config(state='normal')
         self.sample_questions_text.delete(1.0, tk.END)
         
@@ -511,16 +417,48 @@ class AIQuizGenerator:
         
         # Update quiz info
         self.quiz_info.config(text=f"Topic: {description}")
+        self.quiz_question.config(text="Loading questions...")
+        self.clear_options()
+        self.question_counter.config(text="")
+        
+        if self.practice_var.get():
+            self.worker.submit(
+                lambda conn, task: QuestionCursor.open(conn, topic_id),
+                on_done=self.show_practice,
+                on_error=self.show_load_error,
+                channel='quiz'
+            )
+            return
         
-        self.cursor.execute(
-            "SELECT id, question, options, correct_answer, question_type FROM quizzes WHERE topic_id=?", 
-            (topic_id,)
+        # Each load draws a fresh quiz instance; a newer selection cancels this one
+        self.worker.submit(
+            lambda conn, task: assemble_quiz(conn, topic_id),
+            on_done=self.show_quiz_questions,
+            on_error=self.show_load_error,
+            channel='quiz'
         )
-        self.current_quiz_questions = self.cursor.fetchall()
+    
+    def show_quiz_questions(self, quiz):
+        """Start a quiz with a freshly assembled instance"""
+        self.practice = None
+        self.current_quiz = quiz
+        self.current_quiz_questions = quiz.questions
         self.current_question_index = 0
         self.user_quiz_answers = {}
-        
-        if self.current_quiz_questions:
+        self.show_first_question()
+    
+    def show_practice(self, cursor):
+        """Start practice mode on a freshly opened question cursor"""
+        self.practice = cursor
+        self.practice_answers = {}
+        self.current_quiz = None
+        self.current_quiz_questions = []
+        self.show_first_question()
+        self.prefetch_practice_page()
+    
+    def show_first_question(self):
+        """Show the first question of a quiz or practice run, if there is one"""
+        if self.current_question() is not None:
             self.display_question()
             self.quiz_results.config(text="")
         else:
@@ -528,54 +466,112 @@ class AIQuizGenerator:
             self.clear_options()
             self.question_counter.config(text="")
     
+    def show_load_error(self, error):
+        """Report a failed background load"""
+        messagebox.showerror("Error", f"Could not load data: {error}")
+    
+    def current_question(self):
+        """The question being shown, from the practice cursor or the quiz instance"""
+        if self.practice is not None:
+            return self.practice.current
+        if self.current_quiz_questions:
+            return self.current_quiz_questions[self.current_question_index]
+        return None
+    
     def display_question(self):
         """Display current question"""
-        if not self.current_quiz_questions:
+        question = self.current_question()
+        if question is None:
             return
         
-        question_data = self.current_quiz_questions[self.current_question_index]
-        question_id, question, options_json, correct_answer, question_type = question_data
+        start = time.perf_counter()
         
         # Update question counter
-        total_questions = len(self.current_quiz_questions)
-        self.question_counter.config(
-            text=f"Question {self.current_question_index + 1} of {total_questions}"
-        )
-        
-        self.quiz_question.config(text=question)
-        self.clear_options()
+        if self.practice is not None:
+            answered = len(self.practice_answers)
+            correct = sum(1 for answer, is_correct in self.practice_answers.values() if is_correct)
+            self.question_counter.config(
+                text=f"Question {self.practice.index + 1} of {self.practice.total} "
+                     f"(practice: {correct}/{answered} correct)"
+            )
+        else:
+            total_questions = len(self.current_quiz_questions)
+            self.question_counter.config(
+                text=f"Question {self.current_question_index + 1} of {total_questions}"
+            )
         
-        # Parse options
-        options = json.loads(options_json)
+        self.quiz_question.config(text=question.text)
         
-        # Create radio buttons for options using tk.Radiobutton (not ttk)
+        # Reconfigure pooled radio buttons instead of rebuilding them
+        options = question.options
+        self.ensure_option_pool(len(options))
         for i, option in enumerate(options):
+            self.option_buttons[i].config(text=option, value=i)
+        self.show_options(len(options))
+        
+        # Load previous answer if exists
+        if self.practice is not None:
+            self.quiz_answer_var.set(self.practice_answers.get(question.id, (-1, False))[0])
+        elif self.current_question_index in self.user_quiz_answers:
+            self.quiz_answer_var.set(self.user_quiz_answers[self.current_question_index])
+        else:
+            self.quiz_answer_var.set(-1)
+        
+        if self.debug_overlay_visible:
+            # Include layout and redraw in the measurement
+            self.root.update_idletasks()
+            self.record_render_time((time.perf_counter() - start) * 1000)
+    
+    def ensure_option_pool(self, count):
+        """Create option widgets until the pool holds at least ``count``"""
+        while len(self.option_buttons) < count:
             rb = tk.Radiobutton(
                 self.quiz_options_frame, 
-                text=option, 
                 variable=self.quiz_answer_var, 
-                value=option,
                 wraplength=700,
                 justify='left',
                 bg='white',
                 font=('Arial', 10),
                 anchor='w'
             )
+            self.option_buttons.append(rb)
+    
+    def show_options(self, count):
+        """Show the first ``count`` pooled option widgets and hide the rest"""
+        # Hidden widgets are always a suffix of the pool, so re-packing them in
+        # order keeps the options in their original sequence
+        for rb in self.option_buttons[self.visible_options:count]:
             rb.pack(anchor='w', pady=2, padx=20)
-        
-        # Load previous answer if exists
-        if self.current_question_index in self.user_quiz_answers:
-            self.quiz_answer_var.set(self.user_quiz_answers[self.current_question_index])
-        else:
-            self.quiz_answer_var.set("")
+        for rb in self.option_buttons[count:self.visible_options]:
+            rb.pack_forget()
+        self.visible_options = count
     
     def clear_options(self):
-        """Clear option widgets"""
-        for widget in self.quiz_options_frame.winfo_children():
-            widget.destroy()
+        """Hide option widgets; they stay in the pool for the next question"""
+        self.show_options(0)
+    
+    def toggle_debug_overlay(self, event=None):
+        """Show or hide the render-time overlay"""
+        self.debug_overlay_visible = not self.debug_overlay_visible
+        if self.debug_overlay_visible:
+            self.debug_overlay.place(relx=1.0, rely=0.0, anchor='ne')
+            self.debug_overlay.lift()
+        else:
+            self.debug_overlay.place_forget()
+    
+    def record_render_time(self, elapsed_ms):
+        """Update the overlay with the latest navigation render time"""
+        self.render_times = (self.render_times + [elapsed_ms])[-50:]
+        average = sum(self.render_times) / len(self.render_times)
+        self.debug_overlay.config(
+            text=f"render {elapsed_ms:.2f} ms | avg {average:.2f} ms | pool {len(self.option_buttons)}"
+        )
     
     def previous_question(self):
         """Navigate to previous question"""
+        if self.practice is not None:
+            self.move_practice(-1)
+            return
         if self.current_question_index > 0:
             self.save_current_answer()
             self.current_question_index -= 1
@@ -583,83 +579,133 @@ class AIQuizGenerator:
     
     def next_question(self):
         """Navigate to next question"""
+        if self.practice is not None:
+            self.move_practice(1)
+            return
         if self.current_question_index < len(self.current_quiz_questions) - 1:
             self.save_current_answer()
             self.current_question_index += 1
             self.display_question()
     
+    def move_practice(self, delta):
+        """Step the practice cursor, loading the neighbouring page on a worker if needed"""
+        self.save_current_answer()
+        cursor = self.practice
+        if cursor.step(delta):
+            self.display_question()
+            self.prefetch_practice_page()
+            return
+        
+        if delta < 0:
+            request, fetch = cursor.previous_page_request(), fetch_before
+        else:
+            request, fetch = cursor.next_page_request(), fetch_after
+        if request is None:
+            return
+        topic_id, anchor_id = request
+        
+        def show_page(page):
+            if cursor is self.practice:
+                cursor.add_page(anchor_id, page)
+                if cursor.step(delta):
+                    self.display_question()
+                    self.prefetch_practice_page()
+        
+        self.worker.submit(
+            lambda conn, task: fetch(conn, topic_id, anchor_id),
+            on_done=show_page,
+            on_error=self.show_load_error,
+            channel='practice_page'
+        )
+    
+    def prefetch_practice_page(self):
+        """Load the next page in the background once the cursor reaches the last one"""
+        cursor = self.practice
+        request = cursor.next_page_request() if cursor is not None else None
+        if request is None:
+            return
+        topic_id, after_id = request
+        
+        def add_page(page):
+            if cursor is self.practice:
+                cursor.add_page(after_id, page)
+        
+        self.worker.submit(
+            lambda conn, task: fetch_after(conn, topic_id, after_id),
+            on_done=add_page,
+            on_error=self.show_load_error,
+            channel='practice_page'
+        )
+    
     def save_current_answer(self):
         """Save current answer"""
-        if self.quiz_answer_var.get():
-            self.user_quiz_answers[self.current_question_index] = self.quiz_answer_var.get()
+        answer = self.quiz_answer_var.get()
+        if answer < 0:
+            return
+        if self.practice is not None:
+            # Practice answers are graded immediately, so the question can be dropped later
+            question = self.practice.current
+            self.practice_answers[question.id] = (answer, question.is_correct(answer))
+        else:
+            self.user_quiz_answers[self.current_question_index] = answer
     
     def submit_quiz(self):
         """Submit and grade the quiz"""
         self.save_current_answer()
         
-        if not self.user_quiz_answers:
+        if self.practice is not None:
+            answered = self.practice_answers
+        else:
+            answered = self.user_quiz_answers
+        if not answered:
             messagebox.showwarning("Warning", "Please answer at least one question!")
             return
         
-        # Calculate score
-        correct_count = 0
-        total_questions = len(self.current_quiz_questions)
-        
-        for i, question_data in enumerate(self.current_quiz_questions):
-            question_id, question, options_json, correct_answer, question_type = question_data
-            
-            if i in self.user_quiz_answers and self.user_quiz_answers[i] == correct_answer:
-                correct_count += 1
-        
-        score = (correct_count / total_questions) * 100
+        # Calculate score; practice runs are scored over the questions answered
+        if self.practice is not None:
+            total_questions = len(answered)
+            correct_count = sum(1 for answer, is_correct in answered.values() if is_correct)
+            score = (correct_count / total_questions) * 100
+        else:
+            correct_count, total_questions, score = grade_answers(self.current_quiz_questions,
+                                                                  self.user_quiz_answers)
         
         # Determine grade
-        if score >= 90:
-            grade = "A - Excellent!"
-            color = "green"
-        elif score >= 80:
-            grade = "B - Very Good!"
-            color = "green"
-        elif score >= 70:
-            grade = "C - Good!"
-            color = "orange"
-        elif score >= 60:
-            grade = "D - Pass"
-            color = "orange"
-        else:
-            grade = "F - Needs Improvement"
-            color = "red"
+        band = grade_for(score)
+        grade = band.label
+        color = band.color
         
         # Save progress
         topic_name = self.quiz_topic_var.get()
         if topic_name in self.quiz_topic_data:
             topic_id, description = self.quiz_topic_data[topic_name]
-            
-            self.cursor.execute(
-                "SELECT id FROM user_progress WHERE topic_id=?", 
-                (topic_id,)
-            )
-            existing = self.cursor.fetchone()
-            
-            if existing:
-                self.cursor.execute(
-                    "UPDATE user_progress SET quiz_score=?, completed=1, timestamp=? WHERE topic_id=?",
-                    (score, datetime.now(), topic_id)
-                )
+            if self.practice is not None:
+                answers = {quiz_id: answer for quiz_id, (answer, is_correct) in answered.items()}
+                seed = question_ceiling = None
+                mode = PRACTICE_MODE
             else:
-                self.cursor.execute(
-                    "INSERT INTO user_progress (topic_id, quiz_score, completed, timestamp) VALUES (?, ?, ?, ?)",
-                    (topic_id, score, 1, datetime.now())
-                )
-            
-            self.conn.commit()
+                # Stored option positions, independent of this instance's shuffle
+                answers = {i: self.current_quiz_questions[i].stored_position(answer)
+                           for i, answer in self.user_quiz_answers.items()}
+                seed, question_ceiling = self.current_quiz.seed, self.current_quiz.question_ceiling
+                mode = QUIZ_MODE
+            
+            # Wait for the durable acknowledgment on a worker, then refresh that topic
+            def save(conn, task):
+                self.submissions.submit(self.user_id, topic_id, score, answers, seed=seed,
+                                        question_ceiling=question_ceiling, mode=mode).wait(timeout=30)
+            
+            self.worker.submit(
+                save,
+                on_done=lambda result: self.load_progress(topic_id),
+                on_error=lambda exc: messagebox.showerror("Error", f"Could not save your result: {exc}")
+            )
         
         # Display results
         result_text = f"Quiz Completed!\nScore: {score:.1f}% ({correct_count}/{total_questions} correct)\nGrade: {grade}"
         self.quiz_results.config(text=result_text, foreground=color)
         
         messagebox.showinfo("Quiz Results", f"Topic: {topic_name}\n\n{result_text}")
-        self.load_progress()
     
     def send_to_ai(self):
         """Send user message to AI assistant"""
@@ -677,160 +723,34 @@ class AIQuizGenerator:
         self.display_ai_message(f"You asked about {topic_name}: {user_message}", "user")
         
         # Get AI response
-        ai_response = self.get_ai_response(user_message, topic_name)
-        self.display_ai_message(f"AI Assistant: {ai_response}", "ai")
-    
-    def get_ai_response(self, user_message, topic_name):
-        """Get AI response using built-in knowledge base"""
-        knowledge_base = {
-            "Pump Types and Fundamentals": {
-                "keywords": ["pump", "centrifugal", "positive displacement", "impeller", "casing", "volute", "BEP"],
-                "response": """Centrifugal pumps use rotational energy from an impeller to move fluid by converting rotational kinetic energy to hydrodynamic energy. 
-
-Key Components:
-- Impeller: Rotating component that imparts energy to fluid
-- Volute Casing: Converts velocity energy to pressure energy
-- Shaft: Transmits power from motor to impeller
-- Seals: Prevent leakage
-
-Positive displacement pumps move fluid by trapping a fixed amount and forcing it through the system. Types include piston pumps, gear pumps, and diaphragm pumps.
-
-Best Efficiency Point (BEP) is where the pump operates most efficiently with minimal vibration and cavitation."""
-            },
-            "Compressor Types and Components": {
-                "keywords": ["compressor", "reciprocating", "centrifugal", "rotary", "screw", "surge", "intercooler"],
-                "response": """Compressors increase gas pressure by reducing volume. 
-
-Centrifugal Compressors:
-- Use high-speed impellers
-- Suitable for high flow, low pressure applications
-- Provide continuous, pulsation-free flow
-- Can experience surge at low flow conditions
-
-Positive Displacement Compressors:
-Reciprocating: Use pistons in cylinders, suitable for high pressure
-Rotary Screw: Use meshing screws, good for medium pressure
-Rotary Vane: Use sliding vanes in rotor
-
-Key Components:
-- Intercoolers: Cool gas between stages to reduce power
-- Aftercoolers: Cool discharge gas
-- Safety valves: Prevent overpressure
-- Moisture separators: Remove condensate"""
-            },
-            "Measurement Devices": {
-                "keywords": ["measurement", "pressure", "flow", "temperature", "venturi", "transducer", "gauge"],
-                "response": """Common Measurement Devices:
-
-Pressure Measurement:
-- Bourdon Tube Gauges: Mechanical, for local indication
-- Pressure Transducers: Convert pressure to electrical signal
-- Differential Pressure Transmitters: Measure pressure difference
-
-Flow Measurement:
-- Venturi Tubes: Use Bernoulli's principle, high accuracy
-- Orifice Plates: Simple, cost-effective
-- Magnetic Flow Meters: For conductive fluids
-- Ultrasonic Flow Meters: Non-intrusive
-
-Temperature Measurement:
-- RTDs (Resistance Temperature Detectors): High accuracy
-- Thermocouples: Wide temperature range
-- Thermistors: High sensitivity
-
-All devices require proper calibration and installation for accurate measurements."""
-            },
-            "Safety Procedures": {
-                "keywords": ["safety", "startup", "shutdown", "lockout", "tagout", "procedure", "maintenance"],
-                "response": """Safe Pump/Compressor Operation Procedures:
-
-Startup Sequence:
-1. Check lubrication levels and conditions
-2. Verify valve positions (suction open, discharge closed)
-3. Check coupling alignment and guards
-4. Ensure proper ventilation
-5. Verify all safety devices are functional
-6. Start pump/compressor
-7. Gradually open discharge valve
-
-Shutdown Sequence:
-1. Gradually reduce load
-2. Close discharge valve
-3. Stop motor
-4. Isolate equipment with valves
-5. Lockout/Tagout for maintenance
-
-Safety Protocols:
-- Always use Lockout/Tagout during maintenance
-- Wear appropriate PPE
-- Follow manufacturer's instructions
-- Regular inspection and maintenance
-- Pressure testing as required"""
-            },
-            "Cavitation and Pump Safety": {
-                "keywords": ["cavitation", "npsh", "bubbles", "noise", "vibration", "suction"],
-                "response": """Cavitation occurs when liquid pressure drops below vapor pressure, causing vapor bubbles to form and collapse violently.
-
-Causes:
-- Low suction pressure
-- High fluid temperature
-- Clogged suction lines or filters
-- Pump operating too far from BEP
-- Excessive suction lift
-
-Effects:
-- Loud knocking or cracking noises
-- Vibration and reduced performance
-- Pitting damage to impeller and casing
-- Seal and bearing failure
-- Reduced efficiency
-
-Prevention:
-- Maintain adequate NPSH Available > NPSH Required
-- Reduce suction line restrictions
-- Operate pump near BEP
-- Keep fluid temperature within limits
-- Proper suction pipe design
-
-NPSH (Net Positive Suction Head) Required is provided by manufacturer, NPSH Available is determined by system design."""
-            },
-            "Performance Calculations": {
-                "keywords": ["efficiency", "power", "calculation", "performance", "curve", "hydraulic"],
-                "response": """Performance Calculations for Pumps and Compressors:
-
-Pump Efficiency:
-- Overall Efficiency: η = (Hydraulic Power / Shaft Power) × 100%
-- Hydraulic Power: P_hyd = (Q × H × ρ × g) / 1000 [kW]
-  Where: Q = Flow rate (m³/s), H = Total head (m), ρ = Density (kg/m³), g = 9.81 m/s²
-- Shaft Power: P_shaft = (2π × N × T) / 60000 [kW]
-
-Compressor Efficiency:
-- Isothermal Efficiency: Assumes constant temperature compression
-- Volumetric Efficiency: η_vol = (Actual Flow / Theoretical Flow) × 100%
-- Pressure Ratio: PR = P_discharge / P_suction
-
-Characteristic Curves:
-- Show relationship between flow, head, power, and efficiency
-- Help in proper pump selection and operation
-- Identify BEP (Best Efficiency Point)
-
-Typical pump efficiencies: 50-85%, compressors: 60-80%"""
-            }
-        }
-        
-        # Find the matching category
-        user_lower = user_message.lower()
-        response = "I'm your Pumps and Compressors learning assistant! "
-        
-        for category, data in knowledge_base.items():
-            if any(keyword in user_lower for keyword in data["keywords"]):
-                response = data["response"]
-                break
-        else:
-            response += "I can help with topics like pump operation, compressor types, cavitation, efficiency calculations, and safety procedures. Please ask me specific questions about these topics."
-        
+        self.worker.submit(
+            lambda conn, task: self.get_ai_response(conn, user_message, topic_name),
+            on_done=lambda ai_response: self.display_ai_message(f"AI Assistant: {ai_response}", "ai"),
+            on_error=self.show_load_error
+        )
+    
+    def get_ai_response(self, conn, user_message, topic_name):
+        """Answer a question, reusing the cached answer to the same question and topic"""
+        knowledge_base = get_knowledge_base()
+        index = get_index(conn, knowledge_base)
+        response = response_cache.get(index.key, user_message, topic_name)
+        if response is None:
+            response = self.compose_ai_response(knowledge_base, index, user_message, topic_name)
+            response_cache.put(index.key, user_message, topic_name, response)
         return response
     
+    def compose_ai_response(self, knowledge_base, index, user_message, topic_name):
+        """Answer with the best matching knowledge-base, topic and question passages"""
+        results = index.search(user_message, k=RESPONSE_PASSAGES, topic=topic_name)
+        if results:
+            return "\n\n".join(f"[{passage.topic}]\n{plain_text(passage.text)}" for passage, score in results)
+        
+        # Nothing indexed matched; fall back to the whole category entry
+        category = knowledge_base.match(user_message)
+        if category is not None:
+            return plain_text(knowledge_base[category])
+        return plain_text(knowledge_base.general)
+    
     def display_ai_message(self, message, sender):
         """Display message in AI chat"""
         self.ai_chat_display.config(state='normal')
@@ -841,54 +761,96 @@ Typical pump efficiencies: 50-85%, compressors: 60-80%"""
         self.ai_chat_display.config(state='disabled')
         self.ai_chat_display.see(tk.END)
     
-    def load_progress(self):
-        """Load and display user progress"""
-        # Clear treeview
-        for item in self.progress_tree.get_children():
-            self.progress_tree.delete(item)
-        
-        # Get progress data
-        self.cursor.execute('''
-            SELECT t.title, t.week, t.day, 
-                   COALESCE(up.completed, 0) as completed,
-                   COALESCE(up.quiz_score, 0) as quiz_score,
-                   COALESCE(up.timestamp, 'Never') as last_attempt
-            FROM topics t
-            LEFT JOIN user_progress up ON t.id = up.topic_id
-            ORDER BY t.week, t.day
-        ''')
-        
-        progress_data = self.cursor.fetchall()
-        
-        total_topics = len(progress_data)
-        completed_topics = 0
-        total_score = 0
-        scored_topics = 0
-        
-        for topic in progress_data:
-            title, week, day, completed, quiz_score, last_attempt = topic
-            
+    def load_progress(self, topic_id=None):
+        """Load user progress for every topic, or only for ``topic_id``"""
+        # The progress tab loads everything itself when it is first opened
+        if str(self.progress_frame) not in self.built_tabs:
+            return
+        user_id = self.user_id
+        if topic_id is None or not self.progress_order:
+            self.worker.submit(
+                lambda conn, task: conn.execute(TOPIC_PROGRESS, (user_id,)).fetchall(),
+                on_done=self.show_progress,
+                on_error=self.show_load_error,
+                channel='progress'
+            )
+        else:
+            self.worker.submit(
+                lambda conn, task: conn.execute(TOPIC_PROGRESS_ROW, (user_id, topic_id)).fetchall(),
+                on_done=self.update_progress_rows,
+                on_error=self.show_load_error,
+                channel=f'progress:{topic_id}'
+            )
+    
+    def show_progress(self, progress_data):
+        """Apply a full progress refresh, touching only rows that changed"""
+        order = [row[0] for row in progress_data]
+        if order != self.progress_order:
+            # Topics were added, removed or reordered; start the tree over
+            self.progress_tree.delete(*self.progress_tree.get_children())
+            self.progress_rows = {}
+            self.progress_order = order
+            self.progress_rendered = 0
+            self.progress_totals = {'completed': 0, 'score_sum': 0.0, 'scored': 0}
+        
+        self.update_progress_rows(progress_data)
+        if self.progress_rendered == 0:
+            self.render_progress_window()
+    
+    def update_progress_rows(self, progress_data):
+        """Update changed rows in the model, the tree and the summary totals"""
+        for topic_id, title, week, day, completed, quiz_score, last_attempt in progress_data:
             status = "✅ Completed" if completed else "⏳ Not Started"
             score_display = f"{quiz_score:.1f}%" if quiz_score > 0 else "N/A"
             
-            # Format timestamp
-            if last_attempt != 'Never':
-                try:
-                    last_attempt = datetime.strptime(last_attempt, '%Y-%m-%d %H:%M:%S.%f').strftime('%Y-%m-%d')
-                except:
-                    last_attempt = str(last_attempt)[:10]
+            # Stored timestamps start with YYYY-MM-DD
+            last_attempt = 'Never' if last_attempt is None else str(last_attempt)[:10]
             
-            self.progress_tree.insert('', 'end', values=(title, week, day, status, score_display, last_attempt))
+            values = (title, week, day, status, score_display, last_attempt)
+            previous = self.progress_rows.get(topic_id)
+            if previous is not None and previous[0] == values:
+                continue
+            if previous is not None:
+                self.adjust_progress_totals(previous[1], previous[2], -1)
+            self.adjust_progress_totals(completed, quiz_score, 1)
+            self.progress_rows[topic_id] = (values, completed, quiz_score)
             
-            if completed:
-                completed_topics += 1
-            if quiz_score > 0:
-                total_score += quiz_score
-                scored_topics += 1
+            if self.progress_tree.exists(str(topic_id)):
+                self.progress_tree.item(str(topic_id), values=values)
+        
+        self.show_progress_summary()
+    
+    def adjust_progress_totals(self, completed, quiz_score, sign):
+        """Add (sign=1) or remove (sign=-1) one row's share of the totals"""
+        if completed:
+            self.progress_totals['completed'] += sign
+        if quiz_score > 0:
+            self.progress_totals['score_sum'] += sign * quiz_score
+            self.progress_totals['scored'] += sign
+    
+    def render_progress_window(self):
+        """Add the next window of rows to the tree"""
+        end = min(self.progress_rendered + PROGRESS_WINDOW, len(self.progress_order))
+        for topic_id in self.progress_order[self.progress_rendered:end]:
+            values = self.progress_rows[topic_id][0]
+            self.progress_tree.insert('', 'end', iid=str(topic_id), values=values)
+        self.progress_rendered = end
+    
+    def on_progress_scroll(self, first, last):
+        """Keep the scrollbar in sync and render more rows near the bottom"""
+        self.progress_scrollbar.set(first, last)
+        if float(last) > 0.9 and self.progress_rendered < len(self.progress_order):
+            self.render_progress_window()
+    
+    def show_progress_summary(self):
+        """Show the summary line from the running totals"""
+        total_topics = len(self.progress_order)
+        completed_topics = self.progress_totals['completed']
+        scored_topics = self.progress_totals['scored']
         
         # Calculate averages
         completion_rate = (completed_topics / total_topics * 100) if total_topics > 0 else 0
-        average_score = (total_score / scored_topics) if scored_topics > 0 else 0
+        average_score = (self.progress_totals['score_sum'] / scored_topics) if scored_topics > 0 else 0
         
         summary_text = f"Overall Progress: {completed_topics}/{total_topics} topics completed ({completion_rate:.1f}%)"
         if scored_topics > 0:
@@ -897,9 +859,11 @@ Typical pump efficiencies: 50-85%, compressors: 60-80%"""
         self.progress_summary.config(text=summary_text)
 
 def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     root = tk.Tk()
     app = AIQuizGenerator(root)
     root.mainloop()
+    app.worker.shutdown()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,371 @@
+"""Headless JSON API for LMS integrations and mobile clients
+
+Runs on the standard library's threading HTTP server against the same
+database as the apps, with HTTP/1.1 keep-alive, gzip for larger bodies
+and ETags on the read-only question endpoints:
+
+    GET  /topics                          topic list
+    GET  /topics/ID/quiz[?seed=S&ceiling=C]
+                                          a quiz instance; without a seed a new
+                                          one is drawn and returned uncached
+    POST /topics/ID/attempts              {"user", "seed", "question_ceiling",
+                                           "question_ids": [id, ...],
+                                           "answers": {position: option index}}
+    GET  /users/NAME/progress             per-topic progress for a user
+
+Quiz instances never include the correct answers. A submission names its
+instance by seed and ceiling and echoes the question ids it was shown; the
+server rebuilds the instance, answers 409 if its questions no longer match
+(a bank sync retired one in between), and otherwise grades it itself and
+queues the attempt on the shared submission writer. The acknowledgment is
+awaited after the request's pooled connection has been released.
+
+Cacheable bodies are kept per bank version, so a repeated request costs a
+version read and a dictionary lookup, and a matching ``If-None-Match``
+gets an empty 304.
+
+Usage: ``python api_server.py [database] [--host HOST] [--port PORT]``
+"""
+import gzip
+import hashlib
+import json
+import logging
+import re
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from database import DB_PATH, get_engine
+from grading import grade_answers, grade_for
+from progress import get_or_create_user
+from queries import TOPIC_LIST, TOPIC_PROGRESS
+from question_bank import bank_version, seed_question_bank
+from quiz_assembler import assemble_quiz
+from submission_queue import get_submission_writer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+
+# Bodies smaller than this are sent uncompressed
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+MAX_BODY_BYTES = 1 << 20
+SUBMIT_TIMEOUT = 30
+
+
+class ApiError(Exception):
+    """An error response with an HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Response:
+    """A serialised JSON body, its ETag and its lazily compressed form"""
+
+    __slots__ = ('body', 'etag', '_gzipped')
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.etag = '"' + hashlib.blake2b(self.body, digest_size=12).hexdigest() + '"'
+        self._gzipped = None
+
+    def gzipped(self):
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, GZIP_LEVEL, mtime=0)
+        return self._gzipped
+
+
+class ResponseCache:
+    """Thread-safe LRU of cacheable responses, keyed by bank version and URL"""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            response = self._entries.get(key)
+            if response is not None:
+                self._entries.move_to_end(key)
+            return response
+
+    def put(self, key, response):
+        with self._lock:
+            self._entries[key] = response
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def _int_param(query, name):
+    values = query.get(name)
+    if not values:
+        return None
+    try:
+        return int(values[0])
+    except ValueError:
+        raise ApiError(400, f"{name} must be an integer")
+
+
+def _question_payload(question):
+    return {
+        'id': question.id,
+        'text': question.text,
+        'options': question.options,
+        'question_type': question.question_type,
+    }
+
+
+def _quiz_payload(quiz):
+    return {
+        'topic_id': quiz.topic_id,
+        'seed': quiz.seed,
+        'question_ceiling': quiz.question_ceiling,
+        'questions': [_question_payload(q) for q in quiz.questions],
+    }
+
+
+class QuizApi:
+    """Request handling independent of the HTTP plumbing"""
+
+    def __init__(self, engine, writer):
+        self.engine = engine
+        self.writer = writer
+        self.responses = ResponseCache()
+        self._user_ids = {}
+
+    def topics(self, conn, query):
+        rows = conn.execute(TOPIC_LIST).fetchall()
+        return [
+            {'id': topic_id, 'week': week, 'day': day, 'title': title, 'description': description}
+            for topic_id, week, day, title, description in rows
+        ]
+
+    def quiz(self, conn, query, topic_id):
+        seed = _int_param(query, 'seed')
+        ceiling = _int_param(query, 'ceiling')
+        quiz = assemble_quiz(conn, topic_id, seed=seed, question_ceiling=ceiling)
+        if not quiz.questions:
+            raise ApiError(404, f"topic {topic_id} has no questions")
+        return _quiz_payload(quiz)
+
+    def progress(self, conn, query, username):
+        row = conn.execute("SELECT id FROM users WHERE username=?", (username,)).fetchone()
+        rows = conn.execute(TOPIC_PROGRESS, (row[0] if row else None,)).fetchall()
+        return [
+            {'topic_id': topic_id, 'title': title, 'week': week, 'day': day,
+             'completed': bool(completed), 'score': score, 'last_attempt': last_attempt}
+            for topic_id, title, week, day, completed, score, last_attempt in rows
+        ]
+
+    def user_id(self, conn, username):
+        user_id = self._user_ids.get(username)
+        if user_id is None:
+            user_id = get_or_create_user(conn.cursor(), username)
+            conn.commit()
+            self._user_ids[username] = user_id
+        return user_id
+
+    def submit(self, conn, body, topic_id):
+        """Grade and queue an attempt; return the payload and the writer's ticket"""
+        try:
+            seed = int(body['seed'])
+            ceiling = int(body['question_ceiling'])
+            question_ids = [int(quiz_id) for quiz_id in body['question_ids']]
+            answers = body.get('answers') or {}
+            if not isinstance(answers, dict):
+                raise TypeError("answers must be an object")
+            answers = {int(position): None if index is None else int(index)
+                       for position, index in answers.items()}
+        except (KeyError, TypeError, ValueError):
+            raise ApiError(400, "submission needs integer 'seed' and 'question_ceiling', "
+                                "a 'question_ids' list and an 'answers' object")
+
+        quiz = assemble_quiz(conn, topic_id, seed=seed, question_ceiling=ceiling)
+        if not quiz.questions:
+            raise ApiError(404, f"topic {topic_id} has no questions")
+        if question_ids != [question.id for question in quiz.questions]:
+            raise ApiError(409, "the quiz's questions have changed since it was issued; fetch a new quiz")
+        stored = {}
+        for position, index in answers.items():
+            if not 0 <= position < len(quiz.questions):
+                raise ApiError(400, f"answer for unknown quiz position {position}")
+            if index is not None and not 0 <= index < len(quiz.questions[position].options):
+                raise ApiError(400, f"option {index} out of range for quiz position {position}")
+            stored[position] = quiz.questions[position].stored_position(index)
+        correct_count, total, score = grade_answers(quiz.questions, answers)
+        band = grade_for(score)
+
+        user_id = self.user_id(conn, str(body.get('user') or ''))
+        ticket = self.writer.submit(user_id, topic_id, score, stored, seed=seed, question_ceiling=ceiling)
+        return {
+            'score': score,
+            'correct': correct_count,
+            'total': total,
+            'grade': band.letter,
+            'grade_label': band.label,
+            'correct_indices': [q.correct_index for q in quiz.questions],
+        }, ticket
+
+
+# (method, path pattern, QuizApi method, cacheable)
+ROUTES = [
+    ('GET', re.compile(r'^/topics/?$'), 'topics', True),
+    ('GET', re.compile(r'^/topics/(\d+)/quiz/?$'), 'quiz', True),
+    ('POST', re.compile(r'^/topics/(\d+)/attempts/?$'), 'submit', False),
+    ('GET', re.compile(r'^/users/([^/]+)/progress/?$'), 'progress', False),
+]
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    """HTTP/1.1 handler; the connection stays open between requests"""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'QuizApi/1.0'
+    # Small responses on a kept-alive socket must not wait for delayed ACKs
+    disable_nagle_algorithm = True
+
+    api = None
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def log_message(self, format, *args):
+        logger.debug("%s %s", self.address_string(), format % args)
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        try:
+            # Read the body first so an error reply leaves the connection reusable
+            body = self._read_body() if method == 'POST' else None
+            for route_method, pattern, name, cacheable in ROUTES:
+                match = pattern.match(url.path)
+                if match is None:
+                    continue
+                if route_method != method:
+                    raise ApiError(405, f"{method} not allowed on {url.path}")
+                self._handle(method, url, name, cacheable, match.groups(), body)
+                return
+            raise ApiError(404, f"no such endpoint {url.path}")
+        except ApiError as exc:
+            self._send(exc.status, Response({'error': str(exc)}))
+        except TimeoutError:
+            self._send(503, Response({'error': "submission was not acknowledged in time"}))
+        except Exception:
+            logger.exception("Error handling %s %s", method, self.path)
+            self._send(500, Response({'error': "internal error"}))
+
+    def _handle(self, method, url, name, cacheable, groups, body):
+        args = [int(g) if g.isdigit() else unquote(g) for g in groups]
+        query = parse_qs(url.query)
+        # A quiz without a seed is a fresh random draw, so it is never cached
+        cacheable = cacheable and (name != 'quiz' or 'seed' in query)
+
+        ticket = None
+        with self.api.engine.connection() as conn:
+            if cacheable:
+                key = (bank_version(conn), self.path)
+                response = self.api.responses.get(key)
+                if response is None:
+                    response = Response(getattr(self.api, name)(conn, query, *args))
+                    self.api.responses.put(key, response)
+                if self.headers.get('If-None-Match') == response.etag:
+                    self._send(304, response, cacheable=True, body=False)
+                else:
+                    self._send(200, response, cacheable=True)
+                return
+            if method == 'POST':
+                payload, ticket = getattr(self.api, name)(conn, body, *args)
+            else:
+                payload = getattr(self.api, name)(conn, query, *args)
+        # Wait for the durable write only once the connection is back in the pool
+        if ticket is not None:
+            ticket.wait(timeout=SUBMIT_TIMEOUT)
+        self._send(201 if method == 'POST' else 200, Response(payload))
+
+    def _read_body(self):
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if not 0 <= length <= MAX_BODY_BYTES:
+            # The unread body would be parsed as the next request
+            self.close_connection = True
+            raise ApiError(413 if length > 0 else 400, "invalid or oversized request body")
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            raise ApiError(400, "request body must be JSON")
+        if not isinstance(body, dict):
+            raise ApiError(400, "request body must be a JSON object")
+        return body
+
+    def _send(self, status, response, cacheable=False, body=True):
+        payload = response.body
+        gzipped = (body and len(payload) >= GZIP_MIN_BYTES
+                   and 'gzip' in self.headers.get('Accept-Encoding', ''))
+        if gzipped:
+            payload = response.gzipped()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        if cacheable:
+            self.send_header('ETag', response.etag)
+            self.send_header('Cache-Control', 'no-cache')
+        else:
+            self.send_header('Cache-Control', 'no-store')
+        self.send_header('Vary', 'Accept-Encoding')
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(payload) if body else 0))
+        self.end_headers()
+        if body:
+            self.wfile.write(payload)
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, path=DB_PATH):
+    """Build the server and its handler class bound to one database"""
+    api = QuizApi(get_engine(path, seed=seed_question_bank), get_submission_writer(path))
+    handler = type('BoundApiRequestHandler', (ApiRequestHandler,), {'api': api})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    options = {'--host': DEFAULT_HOST, '--port': DEFAULT_PORT}
+    positional = []
+    while argv:
+        arg = argv.pop(0)
+        if arg in options and argv:
+            options[arg] = argv.pop(0)
+        elif arg.startswith('-'):
+            print(__doc__.strip().splitlines()[-1])
+            return 2
+        else:
+            positional.append(arg)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    server = make_server(options['--host'], int(options['--port']),
+                         positional[0] if positional else DB_PATH)
+    logger.info("Serving on http://%s:%s", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""Worker threads for running database and assistant calls off the Tk main loop
+
+Tk is not thread-safe, so workers never touch widgets. Each task's result
+is put on a queue that the UI thread drains with ``root.after``, and the
+completion callback runs there. Tasks submitted on a named channel cancel
+the previous task on that channel, so a slow load for a topic the user has
+already navigated away from never overwrites the newer one.
+"""
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+POLL_MS = 50
+
+
+class Task:
+    """Handle for a submitted unit of work"""
+
+    __slots__ = ('channel', 'func', 'on_done', 'on_error', '_cancelled')
+
+    def __init__(self, channel, func, on_done, on_error):
+        self.channel = channel
+        self.func = func
+        self.on_done = on_done
+        self.on_error = on_error
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+
+class BackgroundExecutor:
+    """Small pool of worker threads, each holding its own database connection
+
+    ``connection_factory`` is a context manager factory (for example
+    ``DatabaseEngine.connection``); every worker enters it once and keeps
+    that connection for its whole life. Work functions are called as
+    ``func(conn, task)`` and may check ``task.cancelled`` in long loops.
+    """
+
+    def __init__(self, root, connection_factory, workers=2, on_busy=None, poll_ms=POLL_MS):
+        self.root = root
+        self.connection_factory = connection_factory
+        self.on_busy = on_busy
+        self.poll_ms = poll_ms
+        self._tasks = queue.Queue()
+        self._results = queue.Queue()
+        self._latest = {}
+        self._pending = 0
+        self._stopped = False
+        self._threads = [
+            threading.Thread(target=self._work, name=f"ui-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, func, on_done=None, on_error=None, channel=None):
+        """Run ``func(conn, task)`` on a worker; ``on_done(result)`` runs on the UI thread"""
+        task = Task(channel, func, on_done, on_error)
+        if channel is not None:
+            previous = self._latest.get(channel)
+            if previous is not None:
+                previous.cancel()
+            self._latest[channel] = task
+        self._set_pending(self._pending + 1)
+        self._tasks.put(task)
+        return task
+
+    def cancel(self, channel):
+        """Cancel the outstanding task on a channel, if any"""
+        task = self._latest.pop(channel, None)
+        if task is not None:
+            task.cancel()
+
+    def shutdown(self):
+        """Stop the workers once they finish their current task"""
+        self._stopped = True
+        for _ in self._threads:
+            self._tasks.put(None)
+
+    def _set_pending(self, pending):
+        was_busy = self._pending > 0
+        self._pending = pending
+        if self.on_busy is not None and was_busy != (pending > 0):
+            self.on_busy(pending > 0)
+
+    def _work(self):
+        with self.connection_factory() as conn:
+            while True:
+                task = self._tasks.get()
+                if task is None:
+                    break
+                if task.cancelled:
+                    self._results.put((task, None, None))
+                    continue
+                try:
+                    result = task.func(conn, task)
+                    self._results.put((task, result, None))
+                except Exception as exc:
+                    logger.exception("Background task failed")
+                    self._results.put((task, None, exc))
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    task, result, error = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                if self._latest.get(task.channel) is task:
+                    del self._latest[task.channel]
+                # A failing callback must not stop later results from being delivered
+                try:
+                    self._set_pending(self._pending - 1)
+                    if task.cancelled:
+                        continue
+                    if error is not None:
+                        if task.on_error is not None:
+                            task.on_error(error)
+                    elif task.on_done is not None:
+                        task.on_done(result)
+                except Exception:
+                    logger.exception("Background task callback failed")
+        finally:
+            if not self._stopped:
+                self.root.after(self.poll_ms, self._poll)
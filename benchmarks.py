@@ -0,0 +1,480 @@
+"""Benchmarks for the data layer, grading and assistant hot paths
+
+Each scale is a synthetic database built under ``BENCH_DIR`` with bulk
+``INSERT ... SELECT`` statements over a recursive counter, from the six
+topics of a fresh install up to 10k topics, 1M questions and 10M
+attempts. Databases are kept between runs and rebuilt with ``--rebuild``.
+
+For every scale the suite times engine startup and schema checks, topic
+and question loading (quiz assembly and practice paging), grading and
+submission, the assistant's retrieval path and progress aggregation, and
+writes the results as JSON. Attempts submitted while timing are deleted
+afterwards, so repeated runs see the same database.
+
+Two checks run first and fail the run when they do not hold: a sampling
+check assembles quizzes from a topic with a large id gap and requires
+full quizzes, no question drawn far more often than uniform sampling
+would give, and unchanged replays after retiring other questions; a
+load-then-sync check requires a bundled bank sync to leave questions and
+topics imported with ``load`` untouched.
+
+``--compare BASELINE.json`` checks the run (or a saved CURRENT.json)
+against a baseline and exits with status 1 when any median slowed down
+by more than the threshold.
+
+Usage: ``python benchmarks.py [--scales tiny,small] [--out RESULTS.json] [--rebuild] [--compare BASELINE.json [CURRENT.json]] [--threshold PCT]``
+"""
+import itertools
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from database import DatabaseEngine, configure_connection
+from grading import AnswerKey, grade_answers, grade_for
+from knowledge_base import get_knowledge_base
+from migrations import ensure_schema, migrate
+from progress import get_or_create_user
+from queries import TOPIC_LIST, TOPIC_PROGRESS, TOPIC_QUESTIONS
+from question_bank import DEFAULT_BANK, load_question_bank, seed_question_bank, sync_question_bank
+from question_cache import Question, question_cache
+from question_cursor import QuestionCursor
+from quiz_assembler import QUIZ_LENGTH, assemble_quiz
+from response_cache import ResponseCache
+from retrieval import BM25Index, database_passages, knowledge_passages
+from submission_queue import SubmissionWriter
+
+BENCH_DIR = 'bench_data'
+
+# name -> (topics, questions, attempts)
+SCALES = {
+    'tiny': (6, 30, 0),
+    'small': (60, 10_000, 100_000),
+    'medium': (1_000, 100_000, 1_000_000),
+    'large': (10_000, 1_000_000, 10_000_000),
+}
+DEFAULT_SCALES = ('tiny', 'small')
+
+# Attempts per synthetic user
+ATTEMPTS_PER_USER = 50
+
+# A benchmark keeps repeating until it has run this long (or MAX_RUNS times)
+MIN_SECONDS = 0.5
+MAX_RUNS = 1000
+
+# Medians must grow by more than this fraction, and by at least
+# NOISE_FLOOR_MS, to count as a regression
+DEFAULT_THRESHOLD = 0.2
+NOISE_FLOOR_MS = 0.05
+
+SAMPLE_QUESTIONS = (
+    "What causes cavitation in centrifugal pumps?",
+    "How do I calculate pump efficiency?",
+    "Why does a compressor surge?",
+    "What maintenance does a reciprocating compressor need?",
+)
+
+COUNTER = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+
+# Sampling check: quizzes drawn, and how far above the uniform expectation
+# any one question's draw count may go
+SAMPLING_QUIZZES = 2000
+SAMPLING_TOLERANCE = 2.5
+# Quizzes rebuilt after retiring a question outside them
+SAMPLING_REPLAYS = 200
+
+
+def build_database(path, topics, questions, attempts):
+    """Create a migrated database filled with synthetic rows"""
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    # Durability does not matter while building throwaway data
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    with conn:
+        conn.execute(COUNTER + '''
+            INSERT INTO topics (id, week, day, title, description, pcs, content)
+            SELECT i, (i - 1) / 7 + 1, (i - 1) % 7 + 1, 'Topic ' || i,
+                   'Synthetic topic ' || i || ' on pumps and compressors', 'PC-' || i,
+                   'Operating principles, performance and maintenance notes for topic ' || i
+            FROM n
+        ''', (topics,))
+        conn.execute(COUNTER + '''
+            INSERT INTO quizzes (id, topic_id, question, correct_index, question_type, source, bank_key)
+            SELECT i, (i - 1) % ? + 1,
+                   'Question ' || i || ': ' || CASE i % 4
+                       WHEN 0 THEN 'what causes cavitation in a centrifugal pump?'
+                       WHEN 1 THEN 'how is the efficiency of a pump calculated?'
+                       WHEN 2 THEN 'why does a centrifugal compressor surge?'
+                       ELSE 'which seal suits a reciprocating compressor?' END,
+                   abs(random()) % 4, 'multiple_choice', 'benchmark', i
+            FROM n
+        ''', (questions, topics))
+        conn.execute(COUNTER + '''
+            INSERT INTO quiz_options (quiz_id, position, text)
+            SELECT n.i, p.position, 'Option ' || p.position || ' for question ' || n.i
+            FROM n, (SELECT 0 AS position UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3) p
+            ORDER BY n.i, p.position
+        ''', (questions,))
+        users = max(1, attempts // ATTEMPTS_PER_USER)
+        conn.execute(COUNTER + '''
+            INSERT OR IGNORE INTO users (id, username, created_at)
+            SELECT i, 'user' || i, '2026-01-01' FROM n
+        ''', (users,))
+        if attempts:
+            conn.execute(COUNTER + '''
+                INSERT INTO quiz_attempts (user_id, topic_id, score, timestamp)
+                SELECT (i - 1) % ? + 1, abs(random()) % ? + 1, abs(random()) % 11 * 10,
+                       datetime('2026-01-01', '+' || i || ' seconds')
+                FROM n
+            ''', (attempts, users, topics))
+            conn.execute('''
+                INSERT OR REPLACE INTO user_topic_summary
+                    (user_id, topic_id, attempts, last_score, best_score, total_score, last_attempt)
+                SELECT user_id, topic_id, COUNT(*), MAX(score), MAX(score), SUM(score), MAX(timestamp)
+                FROM quiz_attempts GROUP BY user_id, topic_id
+            ''')
+        conn.execute("UPDATE bank_state SET version = version + 1 WHERE id = 1")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def measure(fn, min_seconds=MIN_SECONDS, max_runs=MAX_RUNS):
+    """Run ``fn`` repeatedly; return timing statistics in milliseconds"""
+    timings = []
+    deadline = time.perf_counter() + min_seconds
+    while len(timings) < max_runs:
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+        if time.perf_counter() >= deadline:
+            break
+    timings.sort()
+    return {
+        'runs': len(timings),
+        'median_ms': round(statistics.median(timings), 4),
+        'mean_ms': round(statistics.fmean(timings), 4),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4),
+        'min_ms': round(timings[0], 4),
+    }
+
+
+def run_scale(path, counts):
+    """Time every hot path against one database; return {name: stats}"""
+    topics, questions, attempts = counts
+    results = {}
+    rng = random.Random(0)
+    # The question cache is per process and keyed by question id, not by database
+    question_cache.invalidate()
+
+    def bench(name, fn, **kwargs):
+        results[name] = measure(fn, **kwargs)
+        print(f"  {name:<28} {results[name]['median_ms']:>10.3f} ms", file=sys.stderr)
+
+    # init_database / setup_database: engine bootstrap and the per-start schema check
+    bench('engine_startup', lambda: DatabaseEngine(path, pool_size=1).close(), max_runs=50)
+    conn = configure_connection(sqlite3.connect(path))
+    bench('ensure_schema', lambda: ensure_schema(conn))
+
+    # Topic and question loading
+    bench('topic_list', lambda: conn.execute(TOPIC_LIST).fetchall())
+    next_topic = itertools.cycle([rng.randint(1, topics) for _ in range(64)]).__next__
+
+    def topic_questions():
+        topic_id = next_topic()
+        return [Question.from_row(topic_id, row) for row in conn.execute(TOPIC_QUESTIONS, (topic_id,))]
+    bench('topic_questions', topic_questions)
+    bench('assemble_quiz', lambda: assemble_quiz(conn, next_topic()))
+    bench('practice_open', lambda: QuestionCursor.open(conn, next_topic()))
+
+    # Walk topic 1 back and forth, turning around at either end
+    cursor = QuestionCursor.open(conn, 1)
+    direction = [1]
+
+    def practice_step():
+        if not cursor.move(conn, direction[0]):
+            direction[0] = -direction[0]
+            cursor.move(conn, direction[0])
+    bench('practice_step', practice_step)
+
+    # calculate_score / submit_quiz: grading and the durable submit
+    quiz = assemble_quiz(conn, 1, seed=1)
+    answers = {i: rng.randrange(max(1, len(q.options))) for i, q in enumerate(quiz.questions)}
+    bench('grade_quiz', lambda: grade_for(grade_answers(quiz.questions, answers)[2]))
+
+    key = AnswerKey.from_database(conn)
+    sheets = 10_000
+    rows = np.repeat(np.arange(sheets), 10)
+    ids = np.random.default_rng(0).integers(1, questions + 1, sheets * 10)
+    chosen = np.random.default_rng(1).integers(0, 4, sheets * 10)
+    bench('grade_10k_sheets', lambda: key.grade(rows, ids, chosen, sheets), max_runs=50)
+
+    # The benchmark user's attempts are deleted again so the kept database
+    # stays the size it was built with
+    writer = SubmissionWriter(path)
+    user_id = get_or_create_user(conn.cursor(), 'benchmark')
+    conn.commit()
+    try:
+        bench('submit_attempt', lambda: writer.submit(user_id, 1, 50.0, answers).wait(timeout=30),
+              max_runs=20)
+
+        def submit_burst():
+            for ticket in [writer.submit(user_id, 1, 50.0, answers) for _ in range(500)]:
+                ticket.wait(timeout=60)
+        bench('submit_burst_500', submit_burst, max_runs=5)
+    finally:
+        writer.close()
+        with conn:
+            conn.execute("DELETE FROM quiz_attempts WHERE user_id=?", (user_id,))
+            conn.execute("DELETE FROM user_topic_summary WHERE user_id=?", (user_id,))
+
+    # get_ai_response: building the retrieval index, a search and a cache hit
+    knowledge_base = get_knowledge_base()
+    passages = knowledge_passages(knowledge_base) + database_passages(conn)
+    bench('assistant_index_build', lambda: BM25Index.build(passages), max_runs=3)
+    index = BM25Index.build(passages)
+    next_question = itertools.cycle(SAMPLE_QUESTIONS).__next__
+    bench('assistant_search', lambda: index.search(next_question(), 3, 'Topic 1'))
+    cache = ResponseCache()
+    cache.put(index.key, SAMPLE_QUESTIONS[0], 'Topic 1', "answer")
+    bench('assistant_cached', lambda: cache.get(index.key, SAMPLE_QUESTIONS[0], 'Topic 1'))
+
+    # Progress aggregation: the summary-backed screen and a user's full history
+    users = max(1, attempts // ATTEMPTS_PER_USER)
+    next_user = itertools.cycle([rng.randint(1, users) for _ in range(64)]).__next__
+    bench('progress_screen', lambda: conn.execute(TOPIC_PROGRESS, (next_user(),)).fetchall())
+    bench('attempt_history', lambda: conn.execute(
+        "SELECT topic_id, COUNT(*), AVG(score), MAX(timestamp) FROM quiz_attempts "
+        "WHERE user_id=? GROUP BY topic_id", (next_user(),)).fetchall())
+    conn.close()
+    return results
+
+
+def check_sampling(quizzes=SAMPLING_QUIZZES):
+    """Draw quizzes from a topic whose ids straddle another topic's block
+
+    Topic 1 owns ids 1-1000 and 11001-11100, topic 2 the 10k ids between,
+    and every tenth question is retired. Returns the number of short
+    quizzes, the highest per-question draw count against the uniform
+    expectation, how many of ``SAMPLING_REPLAYS`` rebuilt quizzes changed
+    after retiring a question outside them, and whether all are in bounds.
+    """
+    conn = sqlite3.connect(':memory:')
+    migrate(conn)
+    question_cache.invalidate()
+    with conn:
+        conn.execute(COUNTER + "INSERT INTO topics (id, title) SELECT i, 'Topic ' || i FROM n", (2,))
+        conn.execute(COUNTER + '''
+            INSERT INTO quizzes (id, topic_id, question, correct_index, question_type, retired)
+            SELECT i, CASE WHEN i BETWEEN 1001 AND 11000 THEN 2 ELSE 1 END,
+                   'Question ' || i, 0, 'multiple_choice', i % 10 = 0
+            FROM n
+        ''', (11100,))
+        conn.execute(COUNTER + '''
+            INSERT INTO quiz_options (quiz_id, position, text)
+            SELECT n.i, p.position, 'Option ' || p.position
+            FROM n, (SELECT 0 AS position UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3) p
+        ''', (11100,))
+    topic_size = conn.execute("SELECT COUNT(*) FROM quizzes WHERE topic_id=1 AND retired=0").fetchone()[0]
+
+    draws = {}
+    short = 0
+    for seed in range(quizzes):
+        quiz = assemble_quiz(conn, 1, seed=seed)
+        short += len(quiz) < QUIZ_LENGTH
+        for question in quiz.questions:
+            draws[question.id] = draws.get(question.id, 0) + 1
+
+    def snapshot(quiz):
+        return [(question.id, question.options) for question in quiz.questions]
+
+    changed = 0
+    for seed in range(SAMPLING_REPLAYS):
+        quiz = assemble_quiz(conn, 1, seed=seed)
+        chosen = ",".join(str(question.id) for question in quiz.questions)
+        other = conn.execute(
+            f"SELECT id FROM quizzes WHERE topic_id=1 AND retired=0 AND id NOT IN ({chosen}) "
+            "ORDER BY id LIMIT 1 OFFSET ?", (seed,)).fetchone()[0]
+        conn.execute("UPDATE quizzes SET retired=1 WHERE id=?", (other,))
+        question_cache.invalidate()
+        replayed = assemble_quiz(conn, 1, seed=seed, question_ceiling=quiz.question_ceiling)
+        changed += snapshot(replayed) != snapshot(quiz)
+        conn.execute("UPDATE quizzes SET retired=0 WHERE id=?", (other,))
+        question_cache.invalidate()
+    conn.close()
+
+    max_ratio = max(draws.values()) / (quizzes * QUIZ_LENGTH / topic_size)
+    return {
+        'quizzes': quizzes,
+        'short_quizzes': short,
+        'max_draw_ratio': round(max_ratio, 3),
+        'replays_changed': changed,
+        'ok': short == 0 and max_ratio <= SAMPLING_TOLERANCE and changed == 0,
+    }
+
+
+def check_load_then_sync():
+    """Load questions and a topic onto bundled topic ids, then sync the bundled bank again
+
+    The second sync is forced, as after a bank update. Returns how many
+    loaded questions are still active, the loaded topic's title after the
+    sync, and whether nothing was lost.
+    """
+    records = [
+        {'kind': 'topic', 'id': 2, 'title': 'Imported pumps topic'},
+        {'kind': 'question', 'topic_id': 1, 'question': 'Imported question one?',
+         'options': ['a', 'b'], 'correct_answer': 'a'},
+        {'kind': 'question', 'topic_id': 1, 'question': 'Imported question two?',
+         'options': ['c', 'd'], 'correct_answer': 'd'},
+    ]
+    conn = sqlite3.connect(':memory:')
+    migrate(conn)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'imported.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("".join(json.dumps(record) + "\n" for record in records))
+        seed_question_bank(conn)
+        load_question_bank(conn, path)
+        sync_question_bank(conn, DEFAULT_BANK, force=True)
+    active = conn.execute(
+        "SELECT COUNT(*) FROM quizzes WHERE question LIKE 'Imported question%' AND retired=0").fetchone()[0]
+    title = conn.execute("SELECT title FROM topics WHERE id=2").fetchone()[0]
+    conn.close()
+    return {
+        'loaded_active': active,
+        'topic_title': title,
+        'ok': active == 2 and title == records[0]['title'],
+    }
+
+
+def run(scales, rebuild=False, bench_dir=BENCH_DIR):
+    """Build (or reuse) each scale's database and benchmark it"""
+    os.makedirs(bench_dir, exist_ok=True)
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'numpy': np.__version__,
+        'scales': {},
+    }
+    report['sampling'] = sampling = check_sampling()
+    print(f"Sampling check: {sampling['short_quizzes']} short quizzes of {sampling['quizzes']}, "
+          f"max draws {sampling['max_draw_ratio']:.2f}x uniform, "
+          f"{sampling['replays_changed']} of {SAMPLING_REPLAYS} replays changed "
+          f"({'ok' if sampling['ok'] else 'FAILED'})", file=sys.stderr)
+    report['load_then_sync'] = loaded = check_load_then_sync()
+    print(f"Load-then-sync check: {loaded['loaded_active']} of 2 loaded questions active, "
+          f"topic 2 is {loaded['topic_title']!r} ({'ok' if loaded['ok'] else 'FAILED'})", file=sys.stderr)
+    for name in scales:
+        counts = SCALES[name]
+        path = os.path.join(bench_dir, f"bench-{name}.db")
+        build_seconds = None
+        if rebuild or not os.path.exists(path):
+            print(f"Building {name} database {counts} ...", file=sys.stderr)
+            start = time.perf_counter()
+            build_database(path, *counts)
+            build_seconds = round(time.perf_counter() - start, 2)
+        print(f"Benchmarking {name}", file=sys.stderr)
+        report['scales'][name] = {
+            'topics': counts[0],
+            'questions': counts[1],
+            'attempts': counts[2],
+            'build_s': build_seconds,
+            'benchmarks': run_scale(path, counts),
+        }
+    return report
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Return ``(rows, regressions)`` comparing medians present in both reports"""
+    rows = []
+    regressions = 0
+    for scale, results in current['scales'].items():
+        base_results = baseline.get('scales', {}).get(scale, {}).get('benchmarks', {})
+        for name, stats in results['benchmarks'].items():
+            if name not in base_results:
+                continue
+            before = base_results[name]['median_ms']
+            after = stats['median_ms']
+            ratio = after / before if before else float('inf')
+            regressed = ratio > 1 + threshold and after - before > NOISE_FLOOR_MS
+            regressions += regressed
+            rows.append((scale, name, before, after, ratio, regressed))
+    return rows, regressions
+
+
+def print_comparison(rows, threshold):
+    print(f"{'scale':<8} {'benchmark':<24} {'before ms':>11} {'after ms':>11} {'change':>8}")
+    for scale, name, before, after, ratio, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{scale:<8} {name:<24} {before:>11.3f} {after:>11.3f} {(ratio - 1) * 100:>+7.1f}%{flag}")
+    regressions = sum(row[-1] for row in rows)
+    print(f"{regressions} regression(s) over {threshold:.0%} among {len(rows)} benchmarks")
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    scales = list(DEFAULT_SCALES)
+    out = None
+    rebuild = False
+    compare_paths = []
+    threshold = DEFAULT_THRESHOLD
+    try:
+        while argv:
+            arg = argv.pop(0)
+            if arg == '--scales':
+                scales = argv.pop(0).split(',')
+            elif arg == '--out':
+                out = argv.pop(0)
+            elif arg == '--rebuild':
+                rebuild = True
+            elif arg == '--threshold':
+                threshold = float(argv.pop(0)) / 100
+            elif arg == '--compare':
+                compare_paths.append(argv.pop(0))
+                if argv and not argv[0].startswith('--'):
+                    compare_paths.append(argv.pop(0))
+            else:
+                raise ValueError(arg)
+        unknown = [name for name in scales if name not in SCALES]
+        if unknown:
+            raise ValueError(unknown)
+    except (IndexError, ValueError):
+        print(__doc__.strip().splitlines()[-1])
+        return 2
+
+    if len(compare_paths) == 2:
+        with open(compare_paths[1], encoding='utf-8') as f:
+            report = json.load(f)
+    else:
+        report = run(scales, rebuild)
+        if out is None:
+            out = f"benchmarks-{datetime.now():%Y%m%d-%H%M%S}.json"
+        with open(out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {out}", file=sys.stderr)
+        if not (report['sampling']['ok'] and report['load_then_sync']['ok']):
+            return 1
+
+    if compare_paths:
+        with open(compare_paths[0], encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows, regressions = compare(baseline, report, threshold)
+        print_comparison(rows, threshold)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from queue import LifoQueue, Empty
+
+from migrations import ensure_schema
+
+DB_PATH = 'pumps_compressors.db'
+
+# How long a connection waits on another writer before "database is locked"
+BUSY_TIMEOUT_MS = 5000
+
+# Pooled connections per process, overridable for busier deployments
+POOL_SIZE = int(os.environ.get('QUIZ_DB_POOL_SIZE', 8))
+
+# How long a caller waits for a pooled connection before giving up
+ACQUIRE_TIMEOUT = 10.0
+
+
+def configure_connection(conn):
+    """Use WAL so readers never block on the writer, and wait out short locks"""
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    return conn
+
+
+class TimingStats:
+    """Running count/total/max of durations in milliseconds"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, elapsed_ms):
+        with self._lock:
+            self.count += 1
+            self.total_ms += elapsed_ms
+            if elapsed_ms > self.max_ms:
+                self.max_ms = elapsed_ms
+
+    def snapshot(self):
+        with self._lock:
+            average = self.total_ms / self.count if self.count else 0.0
+            return {
+                'count': self.count,
+                'avg_ms': round(average, 3),
+                'max_ms': round(self.max_ms, 3),
+                'total_ms': round(self.total_ms, 3),
+            }
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that reports statement timings to its engine"""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.connection.query_stats.record((time.perf_counter() - start) * 1000)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.connection.query_stats.record((time.perf_counter() - start) * 1000)
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors are TimedCursor instances"""
+
+    query_stats = None
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class DatabaseEngine:
+    """Process-wide SQLite engine with a pool of reusable connections
+
+    The schema is checked (and migrated if needed) once when the engine is
+    created. Callers borrow a connection with ``with engine.connection() as
+    conn:`` and it goes back to the pool when the block exits, so a thread
+    keeps using the same connection for the whole unit of work.
+    """
+
+    def __init__(self, path=DB_PATH, pool_size=POOL_SIZE, seed=None, acquire_timeout=ACQUIRE_TIMEOUT):
+        self.path = path
+        self.pool_size = pool_size
+        self.acquire_timeout = acquire_timeout
+        self.acquire_stats = TimingStats()
+        self.query_stats = TimingStats()
+        self._idle = LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._bootstrap(seed)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, factory=TimedConnection)
+        conn.query_stats = self.query_stats
+        return configure_connection(conn)
+
+    def _bootstrap(self, seed):
+        """Check the schema version and seed sample data once per process"""
+        with self.connection() as conn:
+            ensure_schema(conn)
+            if seed is not None:
+                seed(conn)
+            conn.commit()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+        with self._lock:
+            if self._created < self.pool_size:
+                self._created += 1
+                return self._connect()
+        # Pool exhausted, wait for another thread to hand one back
+        try:
+            return self._idle.get(timeout=self.acquire_timeout)
+        except Empty:
+            raise sqlite3.OperationalError(
+                f"No database connection free after {self.acquire_timeout:g}s "
+                f"(all {self.pool_size} pooled connections are in use)"
+            )
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for the duration of the block"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Database engine is closed")
+        start = time.perf_counter()
+        conn = self._acquire()
+        self.acquire_stats.record((time.perf_counter() - start) * 1000)
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def stats(self):
+        """Return connection-acquire and query timings"""
+        return {
+            'pool_size': self.pool_size,
+            'connections_open': self._created,
+            'acquire': self.acquire_stats.snapshot(),
+            'query': self.query_stats.snapshot(),
+        }
+
+    def close(self):
+        """Close every idle connection; borrowed ones close on release"""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                break
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine(path=DB_PATH, seed=None, pool_size=POOL_SIZE):
+    """Return the process-wide engine, creating it on first use"""
+    global _engine
+    with _engine_lock:
+        if _engine is None or _engine.path != path:
+            if _engine is not None:
+                _engine.close()
+            _engine = DatabaseEngine(path, pool_size=pool_size, seed=seed)
+        return _engine
@@ -0,0 +1,234 @@
+"""Distractor suggestions for new multiple-choice questions
+
+Every option of the active authored questions is indexed by topic as a
+hashed character-trigram vector (L2-normalised, so a dot product is a
+cosine similarity). For a new stem and correct answer, candidates from
+the same topic are ranked by how much they look like the correct answer
+and how related they are to the stem; exact and near-duplicates of the
+answer are dropped. ``suggest_batch`` scores whole groups of questions
+with matrix products per topic, which keeps a 50k-question import fast.
+
+Vectors are stored sparse (a hand-built CSR: a short text has a few dozen
+trigrams out of ``DIMENSIONS``). Scoring densifies one tile of answers and
+one block of questions at a time and keeps a running top list per
+question, so memory stays bounded however large the topic or batch.
+
+The CLI reads bank question records (``topic_id``, ``question``,
+``correct_answer``) and gives each record without ``options`` the correct
+answer plus the suggested distractors.
+
+Usage: ``python distractors.py QUESTIONS.jsonl [database] > OUT.jsonl``
+"""
+import json
+import sys
+import time
+import zlib
+
+import numpy as np
+
+DIMENSIONS = 1024
+# Questions and answers densified per score tile
+BATCH_SIZE = 512
+ANSWER_TILE = 4096
+# Texts hashed per vectorising block
+VECTORIZE_BLOCK = 8192
+
+# Weight of answer-likeness against stem relevance when ranking
+ANSWER_WEIGHT = 0.7
+# Candidates at least this similar to the correct answer are treated as restatements of it
+DUPLICATE_SIMILARITY = 0.9
+
+_buckets = {}
+
+
+def _bucket(trigram):
+    bucket = _buckets.get(trigram)
+    if bucket is None:
+        bucket = _buckets[trigram] = zlib.crc32(trigram.encode('utf-8')) % DIMENSIONS
+    return bucket
+
+
+def normalize_answer(text):
+    return " ".join(text.lower().split())
+
+
+class TrigramVectors:
+    """Unit trigram vectors in compressed sparse row form"""
+
+    __slots__ = ('indptr', 'indices', 'data')
+
+    def __init__(self, indptr, indices, data):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def dense(self, start=0, stop=None):
+        """Rows ``start:stop`` as a dense (rows, DIMENSIONS) float32 matrix"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        first, last = self.indptr[start], self.indptr[stop]
+        counts = np.diff(self.indptr[start:stop + 1])
+        matrix = np.zeros((stop - start, DIMENSIONS), dtype=np.float32)
+        matrix[np.repeat(np.arange(stop - start), counts), self.indices[first:last]] = self.data[first:last]
+        return matrix
+
+
+def _vectorize_block(texts):
+    rows, cols = [], []
+    for row, text in enumerate(texts):
+        padded = f"  {normalize_answer(text)} "
+        for i in range(len(padded) - 2):
+            rows.append(row)
+            cols.append(_bucket(padded[i:i + 3]))
+    # Sorted distinct (row, bucket) cells with their trigram counts
+    cells, counts = np.unique(np.array(rows, dtype=np.int64) * DIMENSIONS + np.array(cols, dtype=np.int64),
+                              return_counts=True)
+    rows = cells // DIMENSIONS
+    data = counts.astype(np.float32)
+    norms = np.sqrt(np.bincount(rows, weights=data * data, minlength=len(texts))).astype(np.float32)
+    data /= norms[rows]
+    return np.bincount(rows, minlength=len(texts)), (cells % DIMENSIONS).astype(np.int16), data
+
+
+def vectorize(texts):
+    """Return the unit trigram vectors of ``texts`` as ``TrigramVectors``"""
+    lengths, indices, data = [np.zeros(1, dtype=np.int64)], [], []
+    for start in range(0, len(texts), VECTORIZE_BLOCK):
+        block_lengths, block_indices, block_data = _vectorize_block(texts[start:start + VECTORIZE_BLOCK])
+        lengths.append(block_lengths)
+        indices.append(block_indices)
+        data.append(block_data)
+    return TrigramVectors(
+        np.cumsum(np.concatenate(lengths)),
+        np.concatenate(indices) if indices else np.zeros(0, dtype=np.int16),
+        np.concatenate(data) if data else np.zeros(0, dtype=np.float32),
+    )
+
+
+class TopicAnswers:
+    """Distinct answers of one topic with their precomputed vectors"""
+
+    __slots__ = ('answers', 'keys', 'vectors')
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.keys = [normalize_answer(answer) for answer in answers]
+        self.vectors = vectorize(answers)
+
+
+class DistractorIndex:
+    """Per-topic answer vectors built from the quizzes table"""
+
+    def __init__(self, topics):
+        self.topics = topics
+
+    @classmethod
+    def build(cls, conn):
+        answers = {}
+        for topic_id, option in conn.execute(
+                "SELECT q.topic_id, o.text FROM quizzes q JOIN quiz_options o ON o.quiz_id = q.id "
+                "WHERE q.retired = 0 AND q.question_type != 'generated_numeric'"):
+            if option.strip():
+                answers.setdefault(topic_id, {}).setdefault(normalize_answer(option), option.strip())
+        return cls({topic_id: TopicAnswers(list(seen.values())) for topic_id, seen in answers.items()})
+
+    def suggest(self, topic_id, question, correct_answer, k=3):
+        """Return up to ``k`` ranked distractors for one question"""
+        return self.suggest_batch([(topic_id, question, correct_answer)], k)[0]
+
+    def suggest_batch(self, items, k=3):
+        """Return ranked distractors for many ``(topic_id, question, correct_answer)`` items"""
+        results = [[] for _ in items]
+        by_topic = {}
+        for position, (topic_id, question, correct_answer) in enumerate(items):
+            by_topic.setdefault(topic_id, []).append(position)
+
+        for topic_id, positions in by_topic.items():
+            topic = self.topics.get(topic_id)
+            if topic is None or not topic.answers:
+                continue
+            for start in range(0, len(positions), BATCH_SIZE):
+                chunk = positions[start:start + BATCH_SIZE]
+                self._score_chunk(topic, [items[p] for p in chunk], k,
+                                  [results[p] for p in chunk])
+        return results
+
+    def _score_chunk(self, topic, items, k, results):
+        answers = vectorize([item[2] for item in items]).dense()
+        stems = vectorize([item[1] for item in items]).dense()
+        # Look past k so a few rejected candidates still leave k suggestions
+        depth = min(k * 3, len(topic.answers))
+        best = np.full((len(items), depth), -np.inf, dtype=np.float32)
+        best_ids = np.zeros((len(items), depth), dtype=np.int64)
+
+        # Running top ``depth`` per question over bounded answer tiles
+        for start in range(0, len(topic.answers), ANSWER_TILE):
+            tile = topic.vectors.dense(start, start + ANSWER_TILE)
+            answer_sim = answers @ tile.T
+            scores = stems @ tile.T
+            scores *= 1 - ANSWER_WEIGHT
+            scores += ANSWER_WEIGHT * answer_sim
+            scores[answer_sim >= DUPLICATE_SIMILARITY] = -np.inf
+            del answer_sim
+
+            merged = np.concatenate([best, scores], axis=1)
+            merged_ids = np.concatenate(
+                [best_ids, np.broadcast_to(np.arange(start, start + tile.shape[0]), scores.shape)], axis=1)
+            top = np.argpartition(-merged, depth - 1, axis=1)[:, :depth]
+            best = np.take_along_axis(merged, top, axis=1)
+            best_ids = np.take_along_axis(merged_ids, top, axis=1)
+
+        # Best first, ties broken by answer order so results do not depend on tiling
+        order = np.lexsort((best_ids, -best), axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        best_ids = np.take_along_axis(best_ids, order, axis=1)
+
+        for row, (item, result) in enumerate(zip(items, results)):
+            correct = normalize_answer(item[2])
+            for score, candidate in zip(best[row].tolist(), best_ids[row].tolist()):
+                if len(result) == k or score == -np.inf:
+                    break
+                if topic.keys[candidate] != correct:
+                    result.append(topic.answers[candidate])
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print(__doc__.strip().splitlines()[-1])
+        return 2
+
+    import sqlite3
+    from database import DB_PATH, configure_connection
+    from migrations import ensure_schema
+
+    conn = configure_connection(sqlite3.connect(argv[1] if len(argv) > 1 else DB_PATH))
+    ensure_schema(conn)
+    start = time.perf_counter()
+    index = DistractorIndex.build(conn)
+    conn.close()
+    built = time.perf_counter() - start
+
+    with open(argv[0], encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    pending = [r for r in records if r.get('kind', 'question') == 'question' and not r.get('options')]
+    start = time.perf_counter()
+    suggestions = index.suggest_batch(
+        [(int(r['topic_id']), r['question'], r['correct_answer']) for r in pending]
+    )
+    elapsed = time.perf_counter() - start
+    for record, distractors in zip(pending, suggestions):
+        record['options'] = [record['correct_answer']] + distractors
+
+    for record in records:
+        print(json.dumps(record, ensure_ascii=False))
+    print(f"Indexed {sum(len(t.answers) for t in index.topics.values())} answers in {built * 1000:.1f} ms; "
+          f"suggested distractors for {len(pending)} questions in {elapsed * 1000:.1f} ms "
+          f"({len(pending) / max(elapsed, 1e-9):,.0f}/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""Vectorised grading of multiple-choice answers and the shared A-F bands
+
+An answer key is two sorted arrays: question ids and the position of each
+question's correct option. A batch of answer sheets is flattened into
+parallel arrays (sheet row, question id, chosen option position, with -1
+for unanswered), looked up in the key with one ``searchsorted`` and
+totalled per sheet with ``bincount``, so grading never loops over sheets
+in Python. ``grade_answers`` applies the same scoring to one quiz in the
+apps, and ``grade_for`` is the banding both apps display.
+
+The CLI reads answer sheets, one JSON object per line with a
+``sheet_id`` and ``answers`` mapping question ids to option positions. It
+grades them in chunks on a process pool against the key from the
+database and writes one result line per sheet, in input order.
+
+Usage: ``python grading.py SHEETS.jsonl [database] [--workers N] > GRADES.jsonl``
+"""
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+CHUNK_LINES = 20000
+
+
+class GradeBand:
+    """A score band: its lower bound, letter, remark and display colour"""
+
+    __slots__ = ('min_score', 'letter', 'remark', 'color', 'emoji')
+
+    def __init__(self, min_score, letter, remark, color, emoji):
+        self.min_score = min_score
+        self.letter = letter
+        self.remark = remark
+        self.color = color
+        self.emoji = emoji
+
+    @property
+    def label(self):
+        return f"{self.letter} - {self.remark}"
+
+    def __repr__(self):
+        return f"GradeBand({self.letter!r}, min_score={self.min_score})"
+
+
+# Highest band first
+GRADE_BANDS = (
+    GradeBand(90, "A", "Excellent!", "green", "🎉"),
+    GradeBand(80, "B", "Very Good!", "green", "👍"),
+    GradeBand(70, "C", "Good!", "orange", "👏"),
+    GradeBand(60, "D", "Pass", "orange", "✅"),
+    GradeBand(0, "F", "Needs Improvement", "red", "📚"),
+)
+
+# Lower bounds in ascending order, for searchsorted
+_BAND_FLOORS = np.array([band.min_score for band in reversed(GRADE_BANDS)], dtype=np.float64)
+
+
+def band_indices(scores):
+    """Index into ``GRADE_BANDS`` for each score in an array"""
+    ascending = np.searchsorted(_BAND_FLOORS, np.asarray(scores, dtype=np.float64), side='right') - 1
+    return len(GRADE_BANDS) - 1 - np.maximum(ascending, 0)
+
+
+def grade_for(score):
+    """The band a single percentage score falls in"""
+    return GRADE_BANDS[int(band_indices([score])[0])]
+
+
+class AnswerKey:
+    """Correct option positions for a set of questions, sorted by question id"""
+
+    __slots__ = ('ids', 'correct')
+
+    def __init__(self, ids, correct):
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(ids, kind='stable')
+        self.ids = ids[order]
+        self.correct = np.asarray(correct, dtype=np.int16)[order]
+
+    @classmethod
+    def from_database(cls, conn):
+        """Every question, retired ones included, so older sheets still grade"""
+        rows = conn.execute("SELECT id, COALESCE(correct_index, -1) FROM quizzes ORDER BY id").fetchall()
+        if not rows:
+            return cls([], [])
+        ids, correct = zip(*rows)
+        return cls(ids, correct)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def lookup(self, question_ids):
+        """Correct positions for an array of question ids; -2 for ids not in the key"""
+        question_ids = np.asarray(question_ids, dtype=np.int64)
+        if not len(self.ids):
+            return np.full(len(question_ids), -2, dtype=np.int16)
+        slots = np.minimum(np.searchsorted(self.ids, question_ids), len(self.ids) - 1)
+        return np.where(self.ids[slots] == question_ids, self.correct[slots], -2)
+
+    def grade(self, sheet_rows, question_ids, answers, sheet_count):
+        """Score flattened answers; return ``(correct, totals, scores)`` per sheet
+
+        ``sheet_rows``, ``question_ids`` and ``answers`` are parallel arrays
+        with one entry per answered or unanswered question (-1 answer).
+        Unknown question ids count towards the total but are never correct.
+        """
+        sheet_rows = np.asarray(sheet_rows, dtype=np.int64)
+        expected = self.lookup(question_ids)
+        hits = (np.asarray(answers, dtype=np.int16) == expected) & (expected >= 0)
+        correct = np.bincount(sheet_rows, weights=hits, minlength=sheet_count).astype(np.int64)
+        totals = np.bincount(sheet_rows, minlength=sheet_count)
+        scores = np.divide(correct * 100.0, totals, out=np.zeros(sheet_count), where=totals > 0)
+        return correct, totals, scores
+
+
+def grade_answers(questions, answers):
+    """Grade one quiz; ``answers`` maps quiz positions to chosen option indices
+
+    Returns ``(correct_count, total_questions, score)`` with unanswered
+    questions counted as wrong.
+    """
+    if not questions:
+        return 0, 0, 0.0
+    expected = np.fromiter((q.correct_index for q in questions), dtype=np.int16, count=len(questions))
+    given = np.full(len(questions), -1, dtype=np.int16)
+    for position, index in answers.items():
+        if index is not None and 0 <= position < len(questions):
+            given[position] = index
+    correct_count = int(np.count_nonzero((given == expected) & (expected >= 0)))
+    return correct_count, len(questions), correct_count * 100.0 / len(questions)
+
+
+# Worker processes receive the key once, through the pool initializer
+_worker_key = None
+
+
+def _init_worker(ids, correct):
+    global _worker_key
+    _worker_key = AnswerKey(ids, correct)
+
+
+def grade_lines(lines, key=None):
+    """Grade a chunk of JSONL answer sheets; return the result lines"""
+    key = _worker_key if key is None else key
+    sheet_ids, counts, question_ids, answers = [], [], [], []
+    for line in lines:
+        if not line.strip():
+            continue
+        sheet = json.loads(line)
+        sheet_answers = sheet.get('answers') or {}
+        sheet_ids.append(json.dumps(sheet.get('sheet_id')))
+        counts.append(len(sheet_answers))
+        question_ids.extend(sheet_answers)
+        answers.extend(sheet_answers.values())
+
+    # None (unanswered) becomes NaN here and then -1
+    chosen = np.nan_to_num(np.array(answers, dtype=np.float64), nan=-1).astype(np.int16)
+    rows = np.repeat(np.arange(len(sheet_ids)), counts)
+    ids = np.fromiter(map(int, question_ids), dtype=np.int64, count=len(question_ids))
+    correct, totals, scores = key.grade(rows, ids, chosen, len(sheet_ids))
+    letters = [GRADE_BANDS[i].letter for i in band_indices(scores).tolist()]
+    return [
+        f'{{"sheet_id": {sheet_id}, "correct": {c}, "total": {t}, "score": {round(s, 2)}, "grade": "{g}"}}'
+        for sheet_id, c, t, s, g in zip(sheet_ids, correct.tolist(), totals.tolist(), scores.tolist(), letters)
+    ]
+
+
+def _chunks(f, size=CHUNK_LINES):
+    chunk = []
+    for line in f:
+        chunk.append(line)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _write_results(out, results):
+    if results:
+        out.write("\n".join(results) + "\n")
+    return len(results)
+
+
+def grade_file(path, key, out, workers=None):
+    """Stream a sheets file through a process pool; return the number of sheets"""
+    workers = workers or os.cpu_count() or 1
+    graded = 0
+    with open(path, encoding='utf-8') as f, ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(key.ids, key.correct)) as pool:
+        # Keep a bounded number of chunks in flight and write results in input order
+        pending = []
+        for chunk in _chunks(f):
+            pending.append(pool.submit(grade_lines, chunk))
+            if len(pending) >= workers * 2:
+                graded += _write_results(out, pending.pop(0).result())
+        for future in pending:
+            graded += _write_results(out, future.result())
+    return graded
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    workers = None
+    if '--workers' in argv:
+        at = argv.index('--workers')
+        workers = int(argv[at + 1])
+        argv = argv[:at] + argv[at + 2:]
+    if not argv:
+        print(__doc__.strip().splitlines()[-1])
+        return 2
+
+    import sqlite3
+    from database import DB_PATH, configure_connection
+    from migrations import ensure_schema
+
+    conn = configure_connection(sqlite3.connect(argv[1] if len(argv) > 1 else DB_PATH))
+    ensure_schema(conn)
+    key = AnswerKey.from_database(conn)
+    conn.close()
+
+    start = time.perf_counter()
+    graded = grade_file(argv[0], key, sys.stdout, workers)
+    elapsed = time.perf_counter() - start
+    print(f"Graded {graded} sheets against {len(key)} questions in {elapsed:.2f}s "
+          f"({graded / max(elapsed, 1e-9):,.0f} sheets/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Keyword matching for the learning assistants
+
+Both front ends route a question to a knowledge-base category by the
+keywords it contains. The keywords are compiled into an Aho-Corasick
+automaton once per knowledge-base load (see ``knowledge_base.py``), so a
+question is scanned in a single pass no matter how many keywords there
+are, and every category is scored by its hits instead of stopping at the
+first category with any match.
+
+Run ``python keyword_matcher.py`` for a questions/sec benchmark.
+"""
+import sys
+import time
+from collections import deque
+
+
+class KeywordMatcher:
+    """Case-insensitive multi-keyword matcher over a fixed set of categories
+
+    ``categories`` maps each category to its keywords, in priority order:
+    earlier categories win ties.
+    """
+
+    def __init__(self, categories):
+        self.categories = list(categories)
+        # Trie as parallel lists: child transitions, failure links and the
+        # category indexes whose keywords end at each state
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for index, keywords in enumerate(categories.values()):
+            for keyword in keywords:
+                self._add(keyword.lower(), index)
+        self._link()
+
+    def _add(self, keyword, index):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = next_state
+        if index not in self._out[state]:
+            self._out[state] += (index,)
+
+    def _link(self):
+        # Breadth-first so a state's failure target is always finished first
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, child in self._goto[state].items():
+                pending.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] += self._out[self._fail[child]]
+
+    def scores(self, text):
+        """Return a hit count for every category, in category order"""
+        goto, fail, out = self._goto, self._fail, self._out
+        hits = [0] * len(self.categories)
+        state = 0
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in out[state]:
+                hits[index] += 1
+        return hits
+
+    def rank(self, text):
+        """Return ``(category, hits)`` for every matching category, best first"""
+        hits = self.scores(text)
+        order = sorted(range(len(hits)), key=lambda i: (-hits[i], i))
+        return [(self.categories[i], hits[i]) for i in order if hits[i]]
+
+    def best(self, text):
+        """Return the highest scoring category, or None when nothing matches"""
+        hits = self.scores(text)
+        top = max(hits, default=0)
+        return self.categories[hits.index(top)] if top else None
+
+
+SAMPLE_QUESTIONS = [
+    "What is the BEP of a centrifugal pump?",
+    "How do I prevent cavitation when NPSH available is low?",
+    "Why does a centrifugal compressor surge at low flow?",
+    "Explain the lockout tagout procedure before maintenance",
+    "How is hydraulic power used in an efficiency calculation?",
+    "Which gauge should I use to measure discharge pressure?",
+    "Tell me something about rotating machinery",
+]
+
+
+def benchmark(matcher, questions=SAMPLE_QUESTIONS, rounds=20000):
+    """Return questions matched per second"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for question in questions:
+            matcher.best(question)
+    elapsed = time.perf_counter() - start
+    return rounds * len(questions) / elapsed
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    rounds = int(argv[0]) if argv else 20000
+    from knowledge_base import load_knowledge_base
+    matcher = load_knowledge_base().matcher
+    for question in SAMPLE_QUESTIONS:
+        print(f"{question!r}: {matcher.rank(question)}")
+    print(f"{benchmark(matcher, rounds=rounds):,.0f} questions/sec")
+
+
+if __name__ == "__main__":
+    main()
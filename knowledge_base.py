@@ -0,0 +1,189 @@
+"""Learning assistant knowledge base shared by the desktop and web apps
+
+The content lives in ``data/knowledge_base.json``: a ``general`` help text
+and a list of ``categories``, each with a ``title`` (matching a topic
+title), routing ``keywords`` and markdown ``content``. Text fields may be a
+string or a list of lines. The file is parsed once into an immutable
+``KnowledgeBase``; ``get_knowledge_base`` re-stats the file at most every
+few seconds and swaps in a new one when it changes, so content edits go
+live without restarting either app.
+
+Usage: ``python knowledge_base.py [KNOWLEDGE_BASE_FILE]`` validates a file.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from types import MappingProxyType
+
+from keyword_matcher import KeywordMatcher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KNOWLEDGE_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'knowledge_base.json')
+
+CHECK_INTERVAL = 2.0
+
+BOLD_RE = re.compile(r"\*\*(.+?)\*\*")
+
+
+class KnowledgeBaseError(ValueError):
+    """Raised when a knowledge base file is invalid"""
+
+    def __init__(self, path, message):
+        super().__init__(f"{path}: {message}")
+        self.path = path
+
+
+def plain_text(markdown):
+    """Strip the bold markers the desktop text widget cannot render"""
+    return BOLD_RE.sub(r"\1", markdown)
+
+
+def _text(path, value, field):
+    if isinstance(value, list) and all(isinstance(line, str) for line in value):
+        value = "\n".join(value)
+    if not isinstance(value, str) or not value.strip():
+        raise KnowledgeBaseError(path, f"{field} must be non-empty text or a list of lines")
+    return value.strip()
+
+
+class KnowledgeBase:
+    """Immutable parsed knowledge base with its compiled keyword matcher"""
+
+    __slots__ = ('path', 'version', 'general', 'entries', 'keywords', 'matcher')
+
+    def __init__(self, path, version, general, entries, keywords):
+        self.path = path
+        self.version = version
+        self.general = general
+        self.entries = MappingProxyType(dict(entries))
+        self.keywords = MappingProxyType({title: tuple(words) for title, words in keywords.items()})
+        self.matcher = KeywordMatcher(self.keywords)
+
+    def __getitem__(self, title):
+        return self.entries[title]
+
+    def __contains__(self, title):
+        return title in self.entries
+
+    def items(self):
+        return self.entries.items()
+
+    def match(self, question):
+        """Return the best category for a question by keyword hits, or None"""
+        return self.matcher.best(question)
+
+    def __repr__(self):
+        return f"KnowledgeBase({self.path!r}, {len(self.entries)} categories, version={self.version[:12]})"
+
+
+def parse_knowledge_base(path, data):
+    """Build a KnowledgeBase from the raw bytes of a knowledge base file"""
+    try:
+        record = json.loads(data.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise KnowledgeBaseError(path, f"invalid JSON ({exc})")
+    if not isinstance(record, dict) or not isinstance(record.get('categories'), list):
+        raise KnowledgeBaseError(path, "expected an object with a 'categories' list")
+
+    entries = {}
+    keywords = {}
+    for position, category in enumerate(record['categories'], 1):
+        title = category.get('title') if isinstance(category, dict) else None
+        if not isinstance(title, str) or not title.strip():
+            raise KnowledgeBaseError(path, f"category {position} has no title")
+        if title in entries:
+            raise KnowledgeBaseError(path, f"duplicate category {title!r}")
+        words = category.get('keywords', [])
+        if not isinstance(words, list) or not all(isinstance(w, str) and w.strip() for w in words):
+            raise KnowledgeBaseError(path, f"keywords of {title!r} must be a list of strings")
+        entries[title] = _text(path, category.get('content'), f"content of {title!r}")
+        keywords[title] = [w.strip() for w in words]
+
+    general = _text(path, record.get('general'), "general")
+    version = hashlib.sha256(data).hexdigest()
+    return KnowledgeBase(path, version, general, entries, keywords)
+
+
+def load_knowledge_base(path=DEFAULT_KNOWLEDGE_BASE):
+    with open(path, 'rb') as f:
+        return parse_knowledge_base(path, f.read())
+
+
+class KnowledgeBaseStore:
+    """Holds the current KnowledgeBase and reloads it when the file changes"""
+
+    def __init__(self, path=DEFAULT_KNOWLEDGE_BASE, check_interval=CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._current = None
+        self._stamp = None
+        self._checked_at = 0.0
+        self.reloads = 0
+
+    def _file_stamp(self):
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self):
+        """Return the current knowledge base, reloading it if the file changed"""
+        now = time.monotonic()
+        current = self._current
+        if current is not None and now - self._checked_at < self.check_interval:
+            return current
+
+        with self._lock:
+            if self._current is not None and now - self._checked_at < self.check_interval:
+                return self._current
+            self._checked_at = now
+            try:
+                stamp = self._file_stamp()
+                if stamp != self._stamp or self._current is None:
+                    self._current = self._reload(stamp)
+            except (OSError, KnowledgeBaseError) as exc:
+                # Keep serving the last good content while the file is being edited
+                if self._current is None:
+                    raise
+                logger.warning("Keeping previous knowledge base: %s", exc)
+            return self._current
+
+    def _reload(self, stamp):
+        start = time.perf_counter()
+        knowledge_base = load_knowledge_base(self.path)
+        self._stamp = stamp
+        self.reloads += 1
+        logger.info("Loaded knowledge base %s (%d categories) in %.1f ms",
+                    self.path, len(knowledge_base.entries), (time.perf_counter() - start) * 1000)
+        return knowledge_base
+
+
+knowledge_base_store = KnowledgeBaseStore()
+
+
+def get_knowledge_base():
+    """Return the shared knowledge base, hot-reloaded when its file changes"""
+    return knowledge_base_store.get()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    path = argv[0] if argv else DEFAULT_KNOWLEDGE_BASE
+    try:
+        knowledge_base = load_knowledge_base(path)
+    except (OSError, KnowledgeBaseError) as exc:
+        print(f"Error: {exc}")
+        return 1
+    print(knowledge_base)
+    for title, words in knowledge_base.keywords.items():
+        print(f"  {title}: {len(knowledge_base[title])} chars, keywords: {', '.join(words)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,424 @@
+"""Versioned schema migrations shared by the desktop and web front ends
+
+Run ``python migrations.py [database]`` once at deploy time. At startup
+the apps only call ``ensure_schema``, which costs a single version read
+when the database is already current.
+"""
+import json
+import logging
+import sqlite3
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+
+
+def for_each_batch(conn, table, handle_batch, batch_size=BATCH_SIZE, columns='*'):
+    """Walk ``table`` in rowid order, committing after every batch
+
+    ``handle_batch(cursor, rows)`` receives up to ``batch_size`` rows
+    (rowid first) and runs inside its own transaction, so upgrading a large
+    database never holds the writer lock for long. Handlers must be
+    idempotent: an interrupted upgrade simply reruns the migration.
+    """
+    cursor = conn.cursor()
+    last_rowid = 0
+    processed = 0
+    while True:
+        cursor.execute(
+            f"SELECT rowid, {columns} FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (last_rowid, batch_size)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        cursor.execute("BEGIN IMMEDIATE")
+        handle_batch(cursor, rows)
+        conn.commit()
+        last_rowid = rows[-1][0]
+        processed += len(rows)
+    return processed
+
+
+def _m001_base_schema(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS topics (
+            id INTEGER PRIMARY KEY,
+            week INTEGER,
+            day INTEGER,
+            title TEXT,
+            description TEXT,
+            pcs TEXT,
+            content TEXT
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS quizzes (
+            id INTEGER PRIMARY KEY,
+            topic_id INTEGER,
+            question TEXT,
+            options TEXT,
+            correct_answer TEXT,
+            question_type TEXT,
+            FOREIGN KEY (topic_id) REFERENCES topics (id)
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_progress (
+            id INTEGER PRIMARY KEY,
+            topic_id INTEGER,
+            quiz_score REAL,
+            completed BOOLEAN,
+            timestamp DATETIME,
+            FOREIGN KEY (topic_id) REFERENCES topics (id)
+        )
+    ''')
+
+
+def _m002_hot_query_indexes(conn):
+    # quizzes WHERE topic_id=? (question loading and sample questions)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_quizzes_topic ON quizzes (topic_id)")
+    # topics ORDER BY week, day without a temp sort
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_topics_week_day ON topics (week, day)")
+    # Covers the user_progress side of the progress LEFT JOIN
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_user_progress_topic
+        ON user_progress (topic_id, completed, quiz_score, timestamp)
+    ''')
+
+
+def _m003_unique_topic_progress(conn):
+    # Older web builds appended a row per submission; keep only the latest
+    # row for each topic before the unique index can be created.
+    def drop_superseded(cursor, rows):
+        cursor.execute('''
+            DELETE FROM user_progress
+            WHERE rowid BETWEEN ? AND ?
+              AND rowid != (
+                  SELECT latest.id FROM user_progress latest
+                  WHERE latest.topic_id IS user_progress.topic_id
+                  ORDER BY latest.timestamp DESC, latest.id DESC
+                  LIMIT 1
+              )
+        ''', (rows[0][0], rows[-1][0]))
+
+    for_each_batch(conn, 'user_progress', drop_superseded, columns='topic_id')
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_user_progress_topic ON user_progress (topic_id)")
+    conn.commit()
+
+
+def _m004_users_and_attempts(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL UNIQUE,
+            created_at DATETIME
+        )
+    ''')
+
+    # Append-only history of every submission
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS quiz_attempts (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            topic_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            answers TEXT,
+            timestamp DATETIME NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (topic_id) REFERENCES topics (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_quiz_attempts_user_topic
+        ON quiz_attempts (user_id, topic_id, timestamp)
+    ''')
+
+    # One row per user and topic, updated incrementally on each submit
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_topic_summary (
+            user_id INTEGER NOT NULL,
+            topic_id INTEGER NOT NULL,
+            attempts INTEGER NOT NULL,
+            last_score REAL,
+            best_score REAL,
+            total_score REAL,
+            last_attempt DATETIME,
+            PRIMARY KEY (user_id, topic_id)
+        ) WITHOUT ROWID
+    ''')
+
+    # Existing single-user progress becomes the history of the local user
+    conn.execute("INSERT OR IGNORE INTO users (id, username, created_at) VALUES (1, 'local', datetime('now'))")
+    conn.execute('''
+        INSERT INTO quiz_attempts (user_id, topic_id, score, timestamp)
+        SELECT 1, topic_id, quiz_score, timestamp FROM user_progress
+        WHERE completed AND topic_id IS NOT NULL
+    ''')
+    conn.execute('''
+        INSERT OR IGNORE INTO user_topic_summary
+            (user_id, topic_id, attempts, last_score, best_score, total_score, last_attempt)
+        SELECT 1, topic_id, 1, quiz_score, quiz_score, quiz_score, timestamp FROM user_progress
+        WHERE completed AND topic_id IS NOT NULL
+    ''')
+
+
+def _m005_question_banks(conn):
+    # Content hashes of imported bank files, so an unchanged file is skipped
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS question_banks (
+            content_hash TEXT PRIMARY KEY,
+            path TEXT,
+            row_count INTEGER,
+            loaded_at DATETIME
+        )
+    ''')
+
+
+def _m006_bank_sync(conn):
+    # Which bank file a question came from, its key within that bank and the
+    # hash of its content, so a sync only touches rows that changed
+    conn.execute("ALTER TABLE quizzes ADD COLUMN source TEXT")
+    conn.execute("ALTER TABLE quizzes ADD COLUMN bank_key TEXT")
+    conn.execute("ALTER TABLE quizzes ADD COLUMN content_hash TEXT")
+    conn.execute("ALTER TABLE quizzes ADD COLUMN retired INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE topics ADD COLUMN content_hash TEXT")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_quizzes_source_key ON quizzes (source, bank_key)")
+
+    # Hot queries only read active questions
+    conn.execute("DROP INDEX IF EXISTS idx_quizzes_topic")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_quizzes_topic_active ON quizzes (topic_id, retired)")
+
+    # A file can be both loaded and synced, so the mode is part of the key
+    conn.execute('''
+        CREATE TABLE question_banks_new (
+            content_hash TEXT NOT NULL,
+            mode TEXT NOT NULL DEFAULT 'load',
+            path TEXT,
+            row_count INTEGER,
+            loaded_at DATETIME,
+            PRIMARY KEY (content_hash, mode)
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO question_banks_new (content_hash, path, row_count, loaded_at)
+        SELECT content_hash, path, row_count, loaded_at FROM question_banks
+    ''')
+    conn.execute("DROP TABLE question_banks")
+    conn.execute("ALTER TABLE question_banks_new RENAME TO question_banks")
+    _mark_legacy_questions(conn)
+
+
+def _mark_legacy_questions(conn):
+    # Questions the apps seeded before banks existed have no source. The
+    # bundled bank sync adopts or retires rows marked 'legacy', and nothing
+    # else, so rows are only marked while no bank file has been loaded:
+    # loaded rows cannot be told apart from seeded ones.
+    if conn.execute("SELECT 1 FROM question_banks WHERE mode='load' LIMIT 1").fetchone():
+        return
+    conn.execute("UPDATE quizzes SET source='legacy' WHERE source IS NULL AND bank_key IS NULL")
+
+
+def _m007_bank_state(conn):
+    # Version counter bumped by every bank change, polled by question caches
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS bank_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO bank_state (id, version) VALUES (1, 0)")
+
+
+def _m008_attempt_seeds(conn):
+    # Seed and id ceiling of the assembled quiz, enough to rebuild it for regrading
+    conn.execute("ALTER TABLE quiz_attempts ADD COLUMN seed INTEGER")
+    conn.execute("ALTER TABLE quiz_attempts ADD COLUMN question_ceiling INTEGER")
+
+
+def _m009_quiz_options(conn):
+    # Options move from a JSON blob to one row each, and the correct answer is
+    # stored as an option position instead of a second copy of its text
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS quiz_options (
+            quiz_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            PRIMARY KEY (quiz_id, position),
+            FOREIGN KEY (quiz_id) REFERENCES quizzes (id)
+        ) WITHOUT ROWID
+    ''')
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(quizzes)")]
+    if 'correct_index' not in columns:
+        conn.execute("ALTER TABLE quizzes ADD COLUMN correct_index INTEGER")
+    conn.commit()
+
+    # Converted rows have their blob cleared, so a rerun skips them. A question
+    # whose answer is not among its options cannot be graded: it is retired
+    # with no correct_index and keeps its correct_answer text for repair.
+    unanswerable = []
+
+    def split_options(cursor, rows):
+        option_rows = []
+        updates = []
+        rejected = []
+        for rowid, options_json, correct_answer in rows:
+            if options_json is None:
+                continue
+            options = json.loads(options_json)
+            option_rows.extend((rowid, position, text) for position, text in enumerate(options))
+            if correct_answer in options:
+                updates.append((options.index(correct_answer), rowid))
+            else:
+                rejected.append((rowid,))
+        cursor.executemany(
+            "INSERT OR REPLACE INTO quiz_options (quiz_id, position, text) VALUES (?, ?, ?)", option_rows
+        )
+        cursor.executemany(
+            "UPDATE quizzes SET correct_index=?, options=NULL, correct_answer=NULL WHERE id=?", updates
+        )
+        cursor.executemany(
+            "UPDATE quizzes SET correct_index=NULL, retired=1, options=NULL WHERE id=?", rejected
+        )
+        unanswerable.extend(rowid for rowid, in rejected)
+
+    for_each_batch(conn, 'quizzes', split_options, columns='options, correct_answer')
+    if unanswerable:
+        logger.warning("Retired %d questions whose correct_answer is not one of their options: ids %s%s",
+                       len(unanswerable), ", ".join(map(str, unanswerable[:50])),
+                       " ..." if len(unanswerable) > 50 else "")
+
+
+def _m010_attempt_mode(conn):
+    # Practice runs are kept in the history but left out of the topic summary
+    conn.execute("ALTER TABLE quiz_attempts ADD COLUMN mode TEXT NOT NULL DEFAULT 'quiz'")
+
+
+def _m011_sources(conn):
+    # Which bank or import last wrote a topic, so a sync leaves imported topics
+    # alone, and the legacy marker for databases that passed migration 6
+    # before it set one
+    conn.execute("ALTER TABLE topics ADD COLUMN source TEXT")
+    _mark_legacy_questions(conn)
+
+
+def _m012_topic_index(conn):
+    # Quiz sampling walks every question of a topic in id order, retired ones
+    # included, which idx_quizzes_topic_active cannot give without a sort
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_quizzes_topic ON quizzes (topic_id)")
+
+
+# (version, description, function, transactional)
+# Each function receives the connection. Transactional migrations run inside
+# a single BEGIN IMMEDIATE together with the version bump. Non-transactional
+# ones manage their own commits (usually through for_each_batch) and must be
+# safe to rerun.
+MIGRATIONS = [
+    (1, "Base topics, quizzes and user_progress tables", _m001_base_schema, True),
+    (2, "Indexes for the quiz and progress hot queries", _m002_hot_query_indexes, True),
+    (3, "Compact user_progress to one row per topic", _m003_unique_topic_progress, False),
+    (4, "Users, append-only quiz attempts and per-user topic summaries", _m004_users_and_attempts, True),
+    (5, "Record imported question bank files", _m005_question_banks, True),
+    (6, "Keys, content hashes and retirement for question bank sync", _m006_bank_sync, True),
+    (7, "Bank version counter for question caches", _m007_bank_state, True),
+    (8, "Quiz instance seeds on attempts", _m008_attempt_seeds, True),
+    (9, "Options in their own table, correct answers as option positions", _m009_quiz_options, False),
+    (10, "Quiz or practice mode on attempts", _m010_attempt_mode, True),
+    (11, "Topic sources and legacy question marker", _m011_sources, True),
+    (12, "Topic index including retired questions for quiz sampling", _m012_topic_index, True),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _create_version_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at DATETIME
+        )
+    ''')
+
+
+def current_version(conn):
+    """Return the applied schema version, or 0 for a fresh database"""
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+
+def _record(cursor, version, description):
+    cursor.execute(
+        "INSERT OR REPLACE INTO schema_version (version, description, applied_at) VALUES (?, ?, datetime('now'))",
+        (version, description)
+    )
+
+
+def migrate(conn, target=None):
+    """Apply every pending migration up to ``target``; return the new version"""
+    target = LATEST_VERSION if target is None else target
+    if conn.in_transaction:
+        conn.commit()
+    _create_version_table(conn)
+    cursor = conn.cursor()
+
+    for version, description, apply, transactional in MIGRATIONS:
+        if version > target or version <= current_version(conn):
+            continue
+
+        start = time.perf_counter()
+        if transactional:
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                # Another process may have migrated while we waited for the lock
+                if version <= current_version(conn):
+                    conn.rollback()
+                    continue
+                apply(conn)
+                _record(cursor, version, description)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        else:
+            apply(conn)
+            cursor.execute("BEGIN IMMEDIATE")
+            _record(cursor, version, description)
+            conn.commit()
+
+        logger.info("Applied migration %d (%s) in %.1f ms",
+                    version, description, (time.perf_counter() - start) * 1000)
+
+    return current_version(conn)
+
+
+def ensure_schema(conn):
+    """Bring the schema up to date; a single version read when already current"""
+    version = current_version(conn)
+    if version >= LATEST_VERSION:
+        return version
+    return migrate(conn)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    from database import DB_PATH
+    path = argv[0] if argv else DB_PATH
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    conn = sqlite3.connect(path)
+    before = current_version(conn)
+    after = migrate(conn)
+    conn.close()
+    print(f"{path}: schema version {before} -> {after}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Progress writes shared by the desktop and web front ends
+
+Every submission is appended to ``quiz_attempts`` and folded into the
+per-user ``user_topic_summary`` row, so progress screens read one small
+indexed row per topic instead of aggregating the attempt history.
+Practice runs are recorded with their mode but never reach the summary,
+since they are scored over the questions answered rather than a quiz.
+"""
+import json
+from datetime import datetime
+
+DEFAULT_USER = 'local'
+
+# quiz_attempts.mode values
+QUIZ_MODE = 'quiz'
+PRACTICE_MODE = 'practice'
+
+RECORD_ATTEMPT = '''
+    INSERT INTO quiz_attempts (user_id, topic_id, score, answers, timestamp, seed, question_ceiling, mode)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+UPDATE_SUMMARY = '''
+    INSERT INTO user_topic_summary
+        (user_id, topic_id, attempts, last_score, best_score, total_score, last_attempt)
+    VALUES (?, ?, 1, ?, ?, ?, ?)
+    ON CONFLICT (user_id, topic_id) DO UPDATE SET
+        attempts = attempts + 1,
+        last_score = excluded.last_score,
+        best_score = MAX(best_score, excluded.best_score),
+        total_score = total_score + excluded.total_score,
+        last_attempt = excluded.last_attempt
+'''
+
+
+def get_or_create_user(cursor, username):
+    """Return the id for ``username``, creating the user on first sight"""
+    username = (username or '').strip() or DEFAULT_USER
+    cursor.execute(
+        "INSERT INTO users (username, created_at) VALUES (?, ?) ON CONFLICT (username) DO NOTHING",
+        (username, datetime.now())
+    )
+    cursor.execute("SELECT id FROM users WHERE username=?", (username,))
+    return cursor.fetchone()[0]
+
+
+def record_attempt(cursor, user_id, topic_id, score, answers=None, timestamp=None,
+                   seed=None, question_ceiling=None, mode=QUIZ_MODE):
+    """Append an attempt and, for quizzes, update the user's summary row for the topic
+
+    ``seed`` and ``question_ceiling`` identify the assembled quiz instance
+    (see ``quiz_assembler``) so the attempt can be regraded later.
+    """
+    if timestamp is None:
+        timestamp = datetime.now()
+    answers_json = json.dumps(answers) if answers is not None else None
+    cursor.execute(RECORD_ATTEMPT, (user_id, topic_id, score, answers_json, timestamp,
+                                    seed, question_ceiling, mode))
+    if mode != PRACTICE_MODE:
+        cursor.execute(UPDATE_SUMMARY, (user_id, topic_id, score, score, score, timestamp))
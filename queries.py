@@ -0,0 +1,82 @@
+"""SQL for the hot read paths shared by the desktop and web front ends
+
+Every statement here is checked by query_plans.py, so keep new hot
+queries in this module rather than inline in the UI code.
+"""
+
+# Topic list in course order
+TOPIC_LIST = "SELECT id, week, day, title, description FROM topics ORDER BY week, day"
+
+# Options of the question aliased ``q`` as a JSON array, in position order
+# (the ordered subquery walks the quiz_options primary key, so no sort step)
+OPTIONS_JSON = (
+    "(SELECT json_group_array(text) FROM "
+    "(SELECT o.text FROM quiz_options o WHERE o.quiz_id = q.id ORDER BY o.position))"
+)
+
+# Question columns in the order Question.from_row expects
+QUESTION_COLUMNS = f"q.id, q.question, {OPTIONS_JSON}, q.correct_index, q.question_type"
+
+# All active questions for one topic
+TOPIC_QUESTIONS = (
+    f"SELECT {QUESTION_COLUMNS} "
+    "FROM quizzes q WHERE q.topic_id=? AND q.retired=0"
+)
+
+# First few active question stems for the assistant's sample list
+SAMPLE_QUESTIONS = "SELECT question FROM quizzes WHERE topic_id=? AND retired=0 LIMIT ?"
+
+# Quiz assembly: the number of ids of a topic up to a ceiling, and the id a
+# given number of ids past another one (sampling by rank). Retired questions
+# are counted so ranks stay put when questions are retired or restored.
+TOPIC_ALL_COUNT_UP_TO = "SELECT COUNT(*) FROM quizzes WHERE topic_id=? AND id<=?"
+TOPIC_ALL_ID_AT_OFFSET = (
+    "SELECT id FROM quizzes WHERE topic_id=? AND id>? AND id<=? ORDER BY id LIMIT 1 OFFSET ?"
+)
+
+# Practice mode: keyset pages of a topic in id order, and its size
+TOPIC_QUESTIONS_AFTER = (
+    f"SELECT {QUESTION_COLUMNS} "
+    "FROM quizzes q WHERE q.topic_id=? AND q.retired=0 AND q.id>? ORDER BY q.id LIMIT ?"
+)
+TOPIC_QUESTIONS_BEFORE = (
+    f"SELECT {QUESTION_COLUMNS} "
+    "FROM quizzes q WHERE q.topic_id=? AND q.retired=0 AND q.id<? ORDER BY q.id DESC LIMIT ?"
+)
+TOPIC_QUESTION_COUNT = "SELECT COUNT(*) FROM quizzes WHERE topic_id=? AND retired=0"
+
+# One row per topic for a user; last_attempt is NULL for topics never attempted
+TOPIC_PROGRESS = '''
+    SELECT t.id, t.title, t.week, t.day,
+           s.attempts IS NOT NULL as completed,
+           COALESCE(s.last_score, 0) as quiz_score,
+           s.last_attempt as last_attempt
+    FROM topics t
+    LEFT JOIN user_topic_summary s ON s.user_id = ? AND s.topic_id = t.id
+    ORDER BY t.week, t.day
+'''
+
+# The same row for a single topic, used to refresh it after a submit
+TOPIC_PROGRESS_ROW = '''
+    SELECT t.id, t.title, t.week, t.day,
+           s.attempts IS NOT NULL as completed,
+           COALESCE(s.last_score, 0) as quiz_score,
+           s.last_attempt as last_attempt
+    FROM topics t
+    LEFT JOIN user_topic_summary s ON s.user_id = ? AND s.topic_id = t.id
+    WHERE t.id = ?
+'''
+
+# name -> (sql, example parameters) for EXPLAIN QUERY PLAN checks
+HOT_QUERIES = {
+    'topic_list': (TOPIC_LIST, ()),
+    'topic_questions': (TOPIC_QUESTIONS, (1,)),
+    'sample_questions': (SAMPLE_QUESTIONS, (1, 8)),
+    'topic_all_count_up_to': (TOPIC_ALL_COUNT_UP_TO, (1, 1000)),
+    'topic_all_id_at_offset': (TOPIC_ALL_ID_AT_OFFSET, (1, 0, 1000, 5)),
+    'topic_questions_after': (TOPIC_QUESTIONS_AFTER, (1, 0, 20)),
+    'topic_questions_before': (TOPIC_QUESTIONS_BEFORE, (1, 500, 20)),
+    'topic_question_count': (TOPIC_QUESTION_COUNT, (1,)),
+    'topic_progress': (TOPIC_PROGRESS, (1,)),
+    'topic_progress_row': (TOPIC_PROGRESS_ROW, (1, 1)),
+}
@@ -0,0 +1,67 @@
+"""Query-plan regression check for the hot queries in queries.py
+
+``python query_plans.py [database]`` prints the EXPLAIN QUERY PLAN of
+every hot query and exits with status 1 if any of them falls back to a
+full table scan or a temporary sort. Without a database argument the
+check runs against a freshly migrated in-memory schema.
+"""
+import sqlite3
+import sys
+
+from migrations import migrate
+from queries import HOT_QUERIES
+
+
+def explain(conn, sql, params=()):
+    """Return the detail lines of EXPLAIN QUERY PLAN for ``sql``"""
+    rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    return [row[3] for row in rows]
+
+
+def plan_problems(plan):
+    """Return the plan lines that indicate a table scan or temp sort
+
+    ``SCAN t USING INDEX ...`` is an ordered index walk and is accepted,
+    as is ``SCAN (subquery-N)``, which reads a co-routine's own rows; a
+    bare ``SCAN t`` or ``SCAN t USING ROWID`` reads the whole table.
+    """
+    problems = []
+    for detail in plan:
+        if detail.startswith('SCAN') and 'INDEX' not in detail and not detail.startswith('SCAN (subquery-'):
+            problems.append(detail)
+        elif 'TEMP B-TREE' in detail:
+            problems.append(detail)
+    return problems
+
+
+def check_query_plans(conn, queries=None):
+    """Return {name: (plan, problems)} for every hot query"""
+    queries = HOT_QUERIES if queries is None else queries
+    results = {}
+    for name, (sql, params) in queries.items():
+        plan = explain(conn, sql, params)
+        results[name] = (plan, plan_problems(plan))
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        conn = sqlite3.connect(argv[0])
+    else:
+        conn = sqlite3.connect(':memory:')
+        migrate(conn)
+
+    failed = False
+    for name, (plan, problems) in check_query_plans(conn).items():
+        status = "FAIL" if problems else "ok"
+        print(f"[{status}] {name}")
+        for detail in plan:
+            print(f"    {detail}")
+        failed = failed or bool(problems)
+    conn.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,515 @@
+"""Bulk loader and incremental sync for topic and question banks
+
+JSONL banks hold one record per line with a ``kind`` of ``topic`` or
+``question``. CSV banks hold one kind per file: a header containing
+``title`` marks a topics file, anything else is read as questions. In CSV
+question files ``options`` is either a JSON list or ``|``-separated text.
+Questions may carry a stable ``key``; without one the key is derived from
+the topic and question text.
+
+``load`` appends a bank as a one-off import. ``sync`` treats the file as
+the source of truth for its questions: it inserts new ones, updates
+changed ones and retires ones that disappeared, without touching attempt
+history. The bundled bank also owns the questions seeded on its topics
+before banks existed (source ``legacy``), so a sync of it retires any it
+cannot adopt. Loaded rows record a ``load:FILE`` source: their questions
+are never retired by a sync, and their topics are not overwritten by one.
+
+Usage: ``python question_bank.py [load|sync] BANK_FILE [database]``
+"""
+import csv
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BANK = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'question_bank.jsonl')
+
+CHUNK_SIZE = 5000
+
+INSERT_TOPIC = '''
+    INSERT OR REPLACE INTO topics (id, week, day, title, description, pcs, content, source)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Source of the questions seeded by the apps before banks existed
+LEGACY_SOURCE = 'legacy'
+
+QUESTION_COLUMNS = ('id', 'topic_id', 'question', 'correct_index', 'question_type')
+
+INSERT_OPTION = "INSERT INTO quiz_options (quiz_id, position, text) VALUES (?, ?, ?)"
+
+
+class BankError(ValueError):
+    """Raised when a bank file contains an invalid record"""
+
+    def __init__(self, path, line, message):
+        super().__init__(f"{path}:{line}: {message}")
+        self.path = path
+        self.line = line
+
+
+class LoadReport:
+    """Outcome of a bank load"""
+
+    def __init__(self, path, content_hash, topics=0, questions=0, seconds=0.0, skipped=False):
+        self.path = path
+        self.content_hash = content_hash
+        self.topics = topics
+        self.questions = questions
+        self.seconds = seconds
+        self.skipped = skipped
+
+    @property
+    def rows(self):
+        return self.topics + self.questions
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self):
+        if self.skipped:
+            return f"{self.path}: unchanged, skipped in {self.seconds * 1000:.1f} ms"
+        return (f"{self.path}: {self.topics} topics, {self.questions} questions "
+                f"in {self.seconds:.2f}s ({self.rows_per_sec:,.0f} rows/sec)")
+
+
+def bank_version(conn):
+    """Return the counter that moves whenever topics or questions change"""
+    return conn.execute("SELECT version FROM bank_state WHERE id=1").fetchone()[0]
+
+
+def bump_bank_version(cursor):
+    """Mark the bank as changed so per-process caches reload it"""
+    cursor.execute("UPDATE bank_state SET version = version + 1 WHERE id=1")
+
+
+def file_hash(path):
+    """Return the SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _parse_options(value):
+    if isinstance(value, list):
+        return value
+    value = (value or '').strip()
+    if value.startswith('['):
+        return json.loads(value)
+    return [option.strip() for option in value.split('|') if option.strip()]
+
+
+def _topic_row(path, line, record):
+    try:
+        topic_id = int(record['id'])
+        title = record['title']
+    except (KeyError, TypeError, ValueError):
+        raise BankError(path, line, "topic needs an integer 'id' and a 'title'")
+    return (
+        topic_id,
+        int(record['week']) if record.get('week') not in (None, '') else None,
+        int(record['day']) if record.get('day') not in (None, '') else None,
+        title,
+        record.get('description'),
+        record.get('pcs'),
+        record.get('content'),
+    )
+
+
+def question_key(topic_id, question):
+    """Default key for a question without an explicit one"""
+    digest = hashlib.sha1(question.encode('utf-8')).hexdigest()[:16]
+    return f"{topic_id}:{digest}"
+
+
+def row_hash(row):
+    """Content hash of a topic or question row"""
+    return hashlib.sha256(json.dumps(row, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _question_row(path, line, record):
+    try:
+        topic_id = int(record['topic_id'])
+        question = record['question']
+        correct_answer = record['correct_answer']
+        options = _parse_options(record.get('options'))
+    except (KeyError, TypeError, ValueError):
+        raise BankError(path, line, "question needs 'topic_id', 'question', 'options' and 'correct_answer'")
+    if len(options) < 2:
+        raise BankError(path, line, "question needs at least two options")
+    if correct_answer not in options:
+        raise BankError(path, line, f"correct_answer {correct_answer!r} is not one of the options")
+    return (
+        topic_id,
+        question,
+        json.dumps(options, ensure_ascii=False),
+        correct_answer,
+        record.get('question_type') or 'multiple_choice',
+    )
+
+
+def _split_options(quiz_id, row):
+    """Return the quizzes row and quiz_options rows for a bank question row"""
+    options = json.loads(row[2])
+    quiz_row = (quiz_id, row[0], row[1], options.index(row[3]), row[4]) + tuple(row[5:])
+    return quiz_row, [(quiz_id, position, text) for position, text in enumerate(options)]
+
+
+def insert_questions(cursor, rows, extra_columns=(), ignore_duplicates=False):
+    """Insert question rows with their options; return how many were inserted
+
+    Rows are ``(topic_id, question, options_json, correct_answer,
+    question_type, *extra)`` with one value per name in ``extra_columns``.
+    Ids are assigned here so the options can be written alongside, so call
+    this inside a write transaction. With ``ignore_duplicates`` rows that
+    hit a unique key are skipped together with their options.
+    """
+    if not rows:
+        return 0
+    cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM quizzes")
+    first_id = cursor.fetchone()[0]
+    quiz_rows, option_rows = [], []
+    for quiz_id, row in enumerate(rows, first_id):
+        quiz_row, options = _split_options(quiz_id, row)
+        quiz_rows.append(quiz_row)
+        option_rows.extend(options)
+
+    columns = QUESTION_COLUMNS + tuple(extra_columns)
+    cursor.executemany(
+        f"INSERT {'OR IGNORE ' if ignore_duplicates else ''}INTO quizzes ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))})",
+        quiz_rows
+    )
+    inserted = cursor.rowcount
+    if inserted < len(quiz_rows):
+        cursor.execute("SELECT id FROM quizzes WHERE id >= ?", (first_id,))
+        kept = {row[0] for row in cursor.fetchall()}
+        option_rows = [option for option in option_rows if option[0] in kept]
+    cursor.executemany(INSERT_OPTION, option_rows)
+    return inserted
+
+
+def update_questions(cursor, rows):
+    """Rewrite existing questions and their options in place
+
+    Rows are ``(topic_id, question, options_json, correct_answer,
+    question_type, content_hash, id)``; updated questions are un-retired.
+    """
+    quiz_rows, option_rows = [], []
+    for row in rows:
+        quiz_row, options = _split_options(row[-1], row[:-1])
+        quiz_rows.append(quiz_row[1:] + quiz_row[:1])
+        option_rows.extend(options)
+    cursor.executemany(
+        "UPDATE quizzes SET topic_id=?, question=?, correct_index=?, question_type=?, "
+        "content_hash=?, retired=0 WHERE id=?", quiz_rows)
+    cursor.executemany("DELETE FROM quiz_options WHERE quiz_id=?", [(row[-1],) for row in rows])
+    cursor.executemany(INSERT_OPTION, option_rows)
+
+
+def _record(path, line, kind, record):
+    if kind == 'topic':
+        row = _topic_row(path, line, record)
+        return kind, row[0], row, line
+    row = _question_row(path, line, record)
+    return kind, record.get('key') or question_key(row[0], row[1]), row, line
+
+
+def read_bank(path):
+    """Yield ('topic' | 'question', key, row, line) tuples from a JSONL or CSV bank"""
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            kind = 'topic' if 'title' in (reader.fieldnames or ()) else 'question'
+            for line, record in enumerate(reader, 2):
+                yield _record(path, line, kind, record)
+        return
+
+    with open(path, encoding='utf-8') as f:
+        for line, text in enumerate(f, 1):
+            text = text.strip()
+            if not text:
+                continue
+            try:
+                record = json.loads(text)
+            except json.JSONDecodeError as exc:
+                raise BankError(path, line, f"invalid JSON ({exc.msg})")
+            kind = record.get('kind')
+            if kind not in ('topic', 'question'):
+                raise BankError(path, line, f"unknown record kind {kind!r}")
+            yield _record(path, line, kind, record)
+
+
+def load_source(path):
+    """The source recorded on rows imported by ``load``"""
+    return f"load:{os.path.basename(path)}"
+
+
+def load_question_bank(conn, path):
+    """Import a bank file in one transaction, unless this content was loaded before
+
+    Topics are upserted by id and questions are appended. The file's content
+    hash is stored in ``question_banks``, so re-running with an unchanged
+    file only costs hashing it.
+    """
+    start = time.perf_counter()
+    content_hash = file_hash(path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM question_banks WHERE content_hash=? AND mode='load'", (content_hash,))
+    if cursor.fetchone():
+        return LoadReport(path, content_hash, seconds=time.perf_counter() - start, skipped=True)
+
+    report = LoadReport(path, content_hash)
+    source = load_source(path)
+    topics, questions = [], []
+
+    def flush():
+        if topics:
+            cursor.executemany(INSERT_TOPIC, [row + (source,) for row in topics])
+            report.topics += len(topics)
+            topics.clear()
+        if questions:
+            report.questions += insert_questions(cursor, [row + (source,) for row in questions], ('source',))
+            questions.clear()
+
+    if conn.in_transaction:
+        conn.commit()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        for kind, key, row, line in read_bank(path):
+            (topics if kind == 'topic' else questions).append(row)
+            if len(topics) + len(questions) >= CHUNK_SIZE:
+                flush()
+        flush()
+        bump_bank_version(cursor)
+        cursor.execute(
+            "INSERT OR REPLACE INTO question_banks (content_hash, path, row_count, loaded_at, mode) VALUES (?, ?, ?, ?, 'load')",
+            (content_hash, path, report.rows, datetime.now())
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    report.seconds = time.perf_counter() - start
+    logger.info("%s", report)
+    return report
+
+
+class SyncReport:
+    """Delta applied by a bank sync"""
+
+    def __init__(self, path, content_hash):
+        self.path = path
+        self.content_hash = content_hash
+        self.topics_inserted = 0
+        self.topics_updated = 0
+        self.inserted = 0
+        self.updated = 0
+        self.retired = 0
+        self.unchanged = 0
+        self.seconds = 0.0
+        self.skipped = False
+
+    def __str__(self):
+        if self.skipped:
+            return f"{self.path}: unchanged, skipped in {self.seconds * 1000:.1f} ms"
+        return (f"{self.path}: topics +{self.topics_inserted} ~{self.topics_updated}, "
+                f"questions +{self.inserted} ~{self.updated} -{self.retired} "
+                f"({self.unchanged} unchanged) in {self.seconds:.2f}s")
+
+
+def _normalised(text):
+    return ' '.join(text.split()).casefold()
+
+
+def _has_legacy_questions(cursor, source):
+    """Whether active legacy questions remain on topics ``source`` may own"""
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM topics t JOIN quizzes q ON q.topic_id = t.id "
+        "WHERE (t.source=? OR t.source IS NULL) AND q.retired=0 AND q.source=?)", (source, LEGACY_SOURCE)
+    )
+    return bool(cursor.fetchone()[0])
+
+
+def sync_question_bank(conn, path=DEFAULT_BANK, force=False):
+    """Bring the database in line with a bank file, applying only the delta
+
+    Every topic and question is hashed. Questions are matched by key
+    within the bank's source (the file name), and the changes are applied
+    in one transaction: new questions are inserted, changed ones updated in
+    place and missing ones marked retired. Rows are never deleted, so quiz
+    attempts keep referring to valid topics and questions. An unchanged file
+    is detected by its content hash and skipped.
+
+    Questions seeded before banks had keys are adopted by topic and
+    whitespace- and case-insensitive text. When syncing the
+    bundled bank, legacy questions on its topics that match nothing are
+    retired, and the unchanged-file shortcut is not taken while any are
+    left. Topics last written by another bank or a load are left as they
+    are and logged.
+    """
+    start = time.perf_counter()
+    content_hash = file_hash(path)
+    report = SyncReport(path, content_hash)
+    cursor = conn.cursor()
+    source = os.path.basename(path)
+    owns_legacy = source == os.path.basename(DEFAULT_BANK)
+    if not force and not (owns_legacy and _has_legacy_questions(cursor, source)):
+        cursor.execute("SELECT 1 FROM question_banks WHERE content_hash=? AND mode='sync'", (content_hash,))
+        if cursor.fetchone():
+            report.skipped = True
+            report.seconds = time.perf_counter() - start
+            return report
+
+    bank_topics = {}
+    bank_questions = {}
+    for kind, key, row, line in read_bank(path):
+        target = bank_topics if kind == 'topic' else bank_questions
+        if key in target:
+            raise BankError(path, line, f"duplicate {kind} key {key!r}")
+        target[key] = (row, row_hash(row))
+
+    if conn.in_transaction:
+        conn.commit()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        cursor.execute("SELECT id, content_hash, source FROM topics")
+        db_topics = {topic_id: (digest, owner) for topic_id, digest, owner in cursor.fetchall()}
+
+        cursor.execute(
+            "SELECT bank_key, id, content_hash, retired FROM quizzes WHERE source=?",
+            (source,)
+        )
+        db_questions = {key: (quiz_id, digest, retired) for key, quiz_id, digest, retired in cursor.fetchall()}
+
+        # Adopt seeded rows, matching on topic and text. Rows with no source at
+        # all predate the legacy marker in databases that also hold loaded rows;
+        # they may be adopted but are never retired.
+        cursor.execute(
+            "SELECT id, topic_id, question, retired, source FROM quizzes "
+            "WHERE bank_key IS NULL AND (source=? OR source IS NULL) "
+            "ORDER BY source IS NULL, id", (LEGACY_SOURCE,)
+        )
+        unkeyed = {}
+        for quiz_id, topic_id, question, retired, owner in cursor.fetchall():
+            unkeyed.setdefault((topic_id, _normalised(question)), []).append(
+                (quiz_id, retired, owner == LEGACY_SOURCE))
+        adopted = []
+        for key, (row, digest) in bank_questions.items():
+            if key in db_questions:
+                continue
+            matches = unkeyed.get((row[0], _normalised(row[1])))
+            if matches:
+                quiz_id, retired, legacy = matches.pop(0)
+                db_questions[key] = (quiz_id, None, retired)
+                adopted.append((source, key, quiz_id))
+        cursor.executemany("UPDATE quizzes SET source=?, bank_key=? WHERE id=?", adopted)
+
+        topic_inserts, topic_updates, foreign_topics = [], [], []
+        for topic_id, (row, digest) in bank_topics.items():
+            if topic_id not in db_topics:
+                topic_inserts.append(row + (digest, source))
+            elif db_topics[topic_id][1] not in (None, source):
+                foreign_topics.append(topic_id)
+            elif db_topics[topic_id] != (digest, source):
+                topic_updates.append(row[1:] + (digest, source, topic_id))
+        if foreign_topics:
+            logger.warning("%s: left topics %s as written by another bank or load",
+                           path, ", ".join(map(str, foreign_topics)))
+
+        inserts, updates, retirements = [], [], []
+        for key, (row, digest) in bank_questions.items():
+            existing = db_questions.get(key)
+            if existing is None:
+                inserts.append(row + (digest, source, key))
+            elif existing[1] != digest or existing[2]:
+                updates.append(row + (digest, existing[0]))
+            else:
+                report.unchanged += 1
+        for key, (quiz_id, digest, retired) in db_questions.items():
+            if key not in bank_questions and not retired:
+                retirements.append((quiz_id,))
+        if owns_legacy:
+            # Leftover legacy questions on the bank's topics are stale seed rows
+            bank_topic_ids = set(bank_topics) | {row[0] for row, digest in bank_questions.values()}
+            retirements.extend(
+                (quiz_id,) for (topic_id, text), matches in unkeyed.items() if topic_id in bank_topic_ids
+                for quiz_id, retired, legacy in matches if legacy and not retired
+            )
+
+        cursor.executemany(
+            "INSERT INTO topics (id, week, day, title, description, pcs, content, content_hash, source) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", topic_inserts)
+        cursor.executemany(
+            "UPDATE topics SET week=?, day=?, title=?, description=?, pcs=?, content=?, content_hash=?, "
+            "source=? WHERE id=?", topic_updates)
+        insert_questions(cursor, inserts, ('content_hash', 'source', 'bank_key'))
+        update_questions(cursor, updates)
+        cursor.executemany("UPDATE quizzes SET retired=1 WHERE id=?", retirements)
+        if topic_inserts or topic_updates or inserts or updates or retirements:
+            bump_bank_version(cursor)
+        cursor.execute(
+            "INSERT OR REPLACE INTO question_banks (content_hash, path, row_count, loaded_at, mode) "
+            "VALUES (?, ?, ?, ?, 'sync')",
+            (content_hash, path, len(bank_topics) + len(bank_questions), datetime.now())
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    report.topics_inserted = len(topic_inserts)
+    report.topics_updated = len(topic_updates)
+    report.inserted = len(inserts)
+    report.updated = len(updates)
+    report.retired = len(retirements)
+    report.seconds = time.perf_counter() - start
+    logger.info("%s", report)
+    return report
+
+
+def seed_question_bank(conn, path=DEFAULT_BANK):
+    """Sync the bundled bank; cheap when the file has not changed"""
+    return sync_question_bank(conn, path)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    mode = 'load'
+    if argv and argv[0] in ('load', 'sync'):
+        mode, argv = argv[0], argv[1:]
+    if not argv:
+        print(__doc__.strip().splitlines()[-1])
+        return 2
+
+    import sqlite3
+    from database import DB_PATH, configure_connection
+    from migrations import ensure_schema
+
+    conn = configure_connection(sqlite3.connect(argv[1] if len(argv) > 1 else DB_PATH))
+    ensure_schema(conn)
+    try:
+        if mode == 'sync':
+            print(sync_question_bank(conn, argv[0]))
+        else:
+            print(load_question_bank(conn, argv[0]))
+    except BankError as exc:
+        print(f"Error: {exc}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""Compact in-memory form of a multiple-choice question, and a cache of them
+
+Quiz assembly, practice paging and grading all pass questions around as
+``Question`` objects built from the rows of ``queries.QUESTION_COLUMNS``.
+``question_cache`` keeps the ones already parsed, by id for quiz assembly
+and by anchor for practice pages, so repeat quizzes and page turns skip
+the option query. It is dropped whenever the bank version in the database
+moves (see ``question_bank.bump_bank_version``); the version is re-read at
+most every ``check_interval`` seconds.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from question_bank import bank_version
+
+
+class Question:
+    """One multiple-choice question with its options as a tuple
+
+    Answers are option indices into ``options``. When the options were
+    shuffled for a quiz instance, ``positions`` maps each shown index back
+    to the option's stored position in ``quiz_options``.
+    """
+
+    __slots__ = ('id', 'topic_id', 'text', 'options', 'correct_index', 'question_type', 'positions')
+
+    def __init__(self, id, topic_id, text, options, correct_index, question_type, positions=None):
+        self.id = id
+        self.topic_id = topic_id
+        self.text = text
+        self.options = options
+        self.correct_index = correct_index
+        self.question_type = question_type
+        self.positions = positions
+
+    @classmethod
+    def from_row(cls, topic_id, row):
+        quiz_id, text, options_json, correct_index, question_type = row
+        options = tuple(json.loads(options_json)) if options_json else ()
+        if correct_index is None or not 0 <= correct_index < len(options):
+            correct_index = -1
+        return cls(quiz_id, topic_id, text, options, correct_index, question_type)
+
+    @property
+    def correct_answer(self):
+        return self.options[self.correct_index] if self.correct_index >= 0 else None
+
+    def is_correct(self, index):
+        return index is not None and index >= 0 and index == self.correct_index
+
+    def stored_position(self, index):
+        """The ``quiz_options`` position of the option shown at ``index``"""
+        if index is None or self.positions is None:
+            return index
+        return self.positions[index]
+
+    def __repr__(self):
+        return f"Question(id={self.id}, topic_id={self.topic_id}, text={self.text!r})"
+
+
+class QuestionCache:
+    """Thread-safe LRU of question id -> Question and page key -> tuple of Questions
+
+    Retired questions are remembered as None, so they are not fetched
+    again either.
+    """
+
+    def __init__(self, max_questions=50_000, max_pages=1024, check_interval=5.0):
+        self.max_questions = max_questions
+        self.max_pages = max_pages
+        self.check_interval = check_interval
+        self._questions = OrderedDict()
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def _check_version(self, conn):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        version = bank_version(conn)
+        with self._lock:
+            if version != self._version:
+                self._questions.clear()
+                self._pages.clear()
+                self._version = version
+            self._checked_at = now
+
+    def get_questions(self, conn, ids, load):
+        """Active questions among ``ids`` by id
+
+        ``load(missing)`` fetches the ids not cached yet and returns the
+        active ones as ``{id: Question}``.
+        """
+        self._check_version(conn)
+        found = {}
+        missing = []
+        with self._lock:
+            for quiz_id in ids:
+                if quiz_id in self._questions:
+                    self._questions.move_to_end(quiz_id)
+                    question = self._questions[quiz_id]
+                    if question is not None:
+                        found[quiz_id] = question
+                    self.hits += 1
+                else:
+                    missing.append(quiz_id)
+                    self.misses += 1
+        if missing:
+            loaded = load(missing)
+            found.update(loaded)
+            with self._lock:
+                for quiz_id in missing:
+                    self._questions[quiz_id] = loaded.get(quiz_id)
+                while len(self._questions) > self.max_questions:
+                    self._questions.popitem(last=False)
+        return found
+
+    def get_page(self, conn, key, load):
+        """The page stored under ``key``, calling ``load()`` on first use"""
+        self._check_version(conn)
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+                self.hits += 1
+                return page
+            self.misses += 1
+        page = load()
+        with self._lock:
+            self._pages[key] = page
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        return page
+
+    def invalidate(self):
+        """Drop everything and re-read the bank version on the next lookup"""
+        with self._lock:
+            self._questions.clear()
+            self._pages.clear()
+            self._checked_at = 0.0
+
+
+question_cache = QuestionCache()
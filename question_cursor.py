@@ -0,0 +1,124 @@
+"""Keyset-paginated walk through every question of a topic (practice mode)
+
+A ``QuestionCursor`` holds a window of at most ``MAX_PAGES`` pages of
+``Question`` objects around the current position, fetched with
+``id > ?`` / ``id < ?`` keyset queries on ``idx_quizzes_topic_active``.
+Moving near the end of the window asks for the next page before it is
+needed. Pages that fall out of the window are dropped, so memory stays
+constant however large the topic is.
+
+Page fetches are plain functions of ``(conn, topic_id, id)``, so the
+desktop app can run them on a worker thread and hand the rows back with
+``add_page``. The web app just calls ``move``, which fetches inline.
+Pages are kept in ``question_cache``, so walking back over a topic, or
+opening it again, reuses them until the bank changes.
+"""
+from queries import TOPIC_QUESTION_COUNT, TOPIC_QUESTIONS_AFTER, TOPIC_QUESTIONS_BEFORE
+from question_cache import Question, question_cache
+
+PAGE_SIZE = 20
+MAX_PAGES = 3
+
+
+def fetch_after(conn, topic_id, after_id, limit=PAGE_SIZE):
+    """The next page of active questions with ids above ``after_id``"""
+    def load():
+        rows = conn.execute(TOPIC_QUESTIONS_AFTER, (topic_id, after_id, limit)).fetchall()
+        return tuple(Question.from_row(topic_id, row) for row in rows)
+    return question_cache.get_page(conn, ('after', topic_id, after_id, limit), load)
+
+
+def fetch_before(conn, topic_id, before_id, limit=PAGE_SIZE):
+    """The previous page of active questions with ids below ``before_id``, in id order"""
+    def load():
+        rows = conn.execute(TOPIC_QUESTIONS_BEFORE, (topic_id, before_id, limit)).fetchall()
+        return tuple(Question.from_row(topic_id, row) for row in reversed(rows))
+    return question_cache.get_page(conn, ('before', topic_id, before_id, limit), load)
+
+
+class QuestionCursor:
+    """Current position in a topic plus a small window of loaded questions"""
+
+    def __init__(self, topic_id, total, first_page, page_size=PAGE_SIZE):
+        self.topic_id = topic_id
+        self.total = total
+        self.page_size = page_size
+        self.window = list(first_page)
+        # Absolute index of window[0] within the topic, and the position in the window
+        self.offset = 0
+        self.position = 0
+
+    @classmethod
+    def open(cls, conn, topic_id, page_size=PAGE_SIZE):
+        """Count the topic and load its first page"""
+        total = conn.execute(TOPIC_QUESTION_COUNT, (topic_id,)).fetchone()[0]
+        return cls(topic_id, total, fetch_after(conn, topic_id, 0, page_size), page_size)
+
+    @property
+    def current(self):
+        return self.window[self.position] if self.window else None
+
+    @property
+    def index(self):
+        """Absolute index of the current question within the topic"""
+        return self.offset + self.position
+
+    @property
+    def has_next(self):
+        return self.index + 1 < self.total
+
+    @property
+    def has_previous(self):
+        return self.index > 0
+
+    def next_page_request(self):
+        """``(topic_id, after_id)`` when the page after the window should be loaded now"""
+        loaded_to = self.offset + len(self.window)
+        if self.window and loaded_to < self.total and len(self.window) - self.position <= self.page_size:
+            return self.topic_id, self.window[-1].id
+        return None
+
+    def previous_page_request(self):
+        """``(topic_id, before_id)`` when stepping back needs the page before the window"""
+        if self.window and self.position == 0 and self.offset > 0:
+            return self.topic_id, self.window[0].id
+        return None
+
+    def add_page(self, anchor_id, questions):
+        """Attach a page fetched after or before ``anchor_id``; stale pages are ignored"""
+        if not questions or not self.window:
+            return
+        if anchor_id == self.window[-1].id and questions[0].id > anchor_id:
+            self.window.extend(questions)
+            excess = len(self.window) - self.page_size * MAX_PAGES
+            if excess > 0 and self.position >= excess:
+                del self.window[:excess]
+                self.offset += excess
+                self.position -= excess
+        elif anchor_id == self.window[0].id and questions[-1].id < anchor_id:
+            self.window[:0] = questions
+            self.offset -= len(questions)
+            self.position += len(questions)
+            del self.window[self.page_size * MAX_PAGES:]
+
+    def step(self, delta):
+        """Move within the loaded window; return False when the target is not loaded"""
+        target = self.position + delta
+        if 0 <= target < len(self.window):
+            self.position = target
+            return True
+        return False
+
+    def move(self, conn, delta):
+        """Move by ``delta`` (1 or -1), fetching pages inline as needed"""
+        if delta < 0 and self.previous_page_request():
+            topic_id, before_id = self.previous_page_request()
+            self.add_page(before_id, fetch_before(conn, topic_id, before_id, self.page_size))
+        moved = self.step(delta)
+        request = self.next_page_request()
+        if request:
+            topic_id, after_id = request
+            self.add_page(after_id, fetch_after(conn, topic_id, after_id, self.page_size))
+            if not moved:
+                moved = self.step(delta)
+        return moved
@@ -0,0 +1,207 @@
+"""Parametric numeric questions for the Performance Calculations topic
+
+Each template draws physically plausible inputs for a whole batch at once
+with NumPy, computes the correct answer from the formulas taught in the
+knowledge base, and derives three distractors from common mistakes (an
+inverted ratio, a missing /1000, forgetting g, ...). Options are shuffled
+per question.
+
+Generated questions are stored in ``quizzes`` with ``question_type``
+``generated_numeric`` under the ``generated`` source, keyed by their text,
+so generating the same variant twice never duplicates it.
+
+Usage: ``python question_generator.py COUNT [database]``
+"""
+import json
+import sys
+import time
+
+import numpy as np
+
+from question_bank import CHUNK_SIZE, bump_bank_version, insert_questions, question_key, row_hash
+
+PERFORMANCE_TOPIC_ID = 6
+GENERATED_TYPE = 'generated_numeric'
+GENERATED_SOURCE = 'generated'
+
+G = 9.81
+ATMOSPHERE_BAR = 1.013
+
+FLUIDS = np.array([
+    ("water", 1000.0),
+    ("sea water", 1025.0),
+    ("light oil", 850.0),
+    ("glycol solution", 1060.0),
+], dtype=object)
+
+
+def _significant(values, unit=""):
+    """Format to three significant figures, without exponents"""
+    decimals = np.clip(2 - np.floor(np.log10(np.maximum(np.abs(values), 1e-9))), 0, 6).astype(int)
+    return [f"{v:,.{d}f}{unit}" for v, d in zip(values.tolist(), decimals.tolist())]
+
+
+def _kw(values):
+    return _significant(values, " kW")
+
+
+def _percent(values):
+    return _significant(values, "%")
+
+
+def _ratio(values):
+    return _significant(values)
+
+
+def hydraulic_power(rng, n):
+    """P_hyd = Q × H × ρ × g / 1000"""
+    flow = np.round(rng.uniform(0.005, 0.5, n), 3)
+    head = rng.integers(5, 151, n).astype(float)
+    fluid = FLUIDS[rng.integers(0, len(FLUIDS), n)]
+    density = fluid[:, 1].astype(float)
+    power = flow * head * density * G / 1000
+    questions = [
+        f"A pump delivers {q:g} m³/s of {name} (ρ = {rho:g} kg/m³) against a total head of "
+        f"{h:g} m. What is the hydraulic power? (g = 9.81 m/s²)"
+        for q, h, name, rho in zip(flow.tolist(), head.tolist(), fluid[:, 0], density.tolist())
+    ]
+    return questions, [
+        _kw(power),
+        _kw(power * 1000),            # missing /1000
+        _kw(power / G),               # forgot g
+        _kw(flow * head * G / 1000),  # forgot the density
+    ]
+
+
+def pump_efficiency(rng, n):
+    """η = P_out / P_in × 100%"""
+    shaft = np.round(rng.uniform(5, 400, n), 1)
+    output = np.round(shaft * rng.uniform(0.45, 0.9, n), 1)
+    efficiency = output / shaft * 100
+    questions = [
+        f"A pump draws {p_in:g} kW at the shaft and delivers {p_out:g} kW of hydraulic power. "
+        f"What is its overall efficiency?"
+        for p_in, p_out in zip(shaft.tolist(), output.tolist())
+    ]
+    return questions, [
+        _percent(efficiency),
+        _percent(shaft / output * 100),  # inverted ratio
+        _percent(efficiency / 100),      # forgot × 100
+        _percent(100 - efficiency),      # computed the losses
+    ]
+
+
+def pressure_ratio(rng, n):
+    """PR = P_discharge / P_suction, both absolute"""
+    suction = np.round(rng.uniform(1.0, 5.0, n), 2)
+    discharge = np.round(suction * rng.uniform(1.5, 6.0, n), 2)
+    ratio = discharge / suction
+    questions = [
+        f"A compressor takes in gas at {p1:g} bar(a) and discharges it at {p2:g} bar(a). "
+        f"What is the pressure ratio?"
+        for p1, p2 in zip(suction.tolist(), discharge.tolist())
+    ]
+    return questions, [
+        _ratio(ratio),
+        _ratio(suction / discharge),  # inverted ratio
+        _ratio(discharge - suction),  # difference, not ratio
+        _ratio((discharge + ATMOSPHERE_BAR) / (suction + ATMOSPHERE_BAR)),  # added atmosphere again
+    ]
+
+
+def volumetric_efficiency(rng, n):
+    """η_vol = actual flow / theoretical flow × 100%"""
+    theoretical = np.round(rng.uniform(2.0, 60.0, n), 1)
+    actual = np.round(theoretical * rng.uniform(0.6, 0.95, n), 1)
+    efficiency = actual / theoretical * 100
+    questions = [
+        f"A reciprocating compressor has a swept volume of {v_th:g} m³/min and delivers "
+        f"{v_act:g} m³/min of free air. What is its volumetric efficiency?"
+        for v_th, v_act in zip(theoretical.tolist(), actual.tolist())
+    ]
+    return questions, [
+        _percent(efficiency),
+        _percent(theoretical / actual * 100),  # inverted ratio
+        _percent(efficiency / 100),            # forgot × 100
+        _percent(100 - efficiency),            # clearance loss instead
+    ]
+
+
+TEMPLATES = (hydraulic_power, pump_efficiency, pressure_ratio, volumetric_efficiency)
+
+
+def generate_questions(count, seed=None, topic_id=PERFORMANCE_TOPIC_ID):
+    """Return ``count`` question rows ``(topic_id, question, options, correct_answer, question_type)``"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    while len(rows) < count:
+        needed = count - len(rows)
+        per_template = np.bincount(rng.integers(0, len(TEMPLATES), needed), minlength=len(TEMPLATES))
+        for template, n in zip(TEMPLATES, per_template.tolist()):
+            if not n:
+                continue
+            questions, columns = template(rng, n)
+            options = np.array(columns, dtype=object).T
+            # Column 0 is correct; shuffle every row independently
+            order = rng.random(options.shape).argsort(axis=1)
+            shuffled = options[np.arange(n)[:, None], order]
+            for question, correct, choices in zip(questions, options[:, 0], shuffled.tolist()):
+                # Rounding can make two options print the same; skip those variants
+                if len(set(choices)) == len(choices):
+                    rows.append((topic_id, question, json.dumps(choices, ensure_ascii=False),
+                                 correct, GENERATED_TYPE))
+    return rows[:count]
+
+
+def insert_generated(conn, rows):
+    """Bulk insert generated rows in one transaction; return how many were new"""
+    if conn.in_transaction:
+        conn.commit()
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    inserted = 0
+    try:
+        for start in range(0, len(rows), CHUNK_SIZE):
+            inserted += insert_questions(cursor, [
+                row + (row_hash(row), GENERATED_SOURCE, question_key(row[0], row[1]))
+                for row in rows[start:start + CHUNK_SIZE]
+            ], ('content_hash', 'source', 'bank_key'), ignore_duplicates=True)
+        if inserted:
+            bump_bank_version(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return inserted
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print(__doc__.strip().splitlines()[-1])
+        return 2
+
+    import sqlite3
+    from database import DB_PATH, configure_connection
+    from migrations import ensure_schema
+
+    count = int(argv[0])
+    start = time.perf_counter()
+    rows = generate_questions(count)
+    generated = time.perf_counter() - start
+
+    conn = configure_connection(sqlite3.connect(argv[1] if len(argv) > 1 else DB_PATH))
+    ensure_schema(conn)
+    start = time.perf_counter()
+    inserted = insert_generated(conn, rows)
+    written = time.perf_counter() - start
+    conn.close()
+
+    print(f"Generated {len(rows)} questions in {generated * 1000:.1f} ms "
+          f"({len(rows) / max(generated, 1e-9):,.0f}/s); "
+          f"inserted {inserted} new in {written * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
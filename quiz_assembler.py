@@ -0,0 +1,137 @@
+"""Randomised quiz instances drawn from a topic without fetching all of it
+
+A quiz instance is ``QUIZ_LENGTH`` questions sampled from a topic, in
+random order, each with its options shuffled. Everything random follows
+from the seed, and sampling only considers question ids up to a ceiling
+(the highest quiz id when the quiz was assembled). The seed and ceiling
+are stored with the attempt, so ``replay_attempt`` rebuilds the same
+instance for regrading.
+
+Questions are sampled uniformly by rank over every question of the topic
+up to the ceiling, retired ones included, so the domain never changes
+once the ceiling is fixed. Ranks are drawn one after another from
+``random.Random(seed)`` and resolved to ids by walking ``idx_quizzes_topic``
+with ``LIMIT 1 OFFSET``; retired picks are skipped and the next draw takes
+their place. Retiring or restoring other questions of the topic therefore
+leaves an instance unchanged; only a retired question of its own (or a
+restored one drawn ahead of it) changes a slot. Each question's options
+are shuffled by a generator seeded from the quiz seed and its id, so they
+do not depend on how many draws the sampling took. Gaps in the id range
+never skew the draw, and no query fetches or sorts the topic's rows.
+Picked questions come from ``question_cache`` once parsed, so only the
+rank walk touches the database for questions seen before.
+"""
+import json
+import random
+
+from queries import QUESTION_COLUMNS, TOPIC_ALL_COUNT_UP_TO, TOPIC_ALL_ID_AT_OFFSET
+from question_cache import Question, question_cache
+
+QUIZ_LENGTH = 10
+
+SEED_BITS = 31
+
+
+class QuizInstance:
+    """The questions of one quiz attempt and how to rebuild them"""
+
+    __slots__ = ('topic_id', 'seed', 'question_ceiling', 'questions')
+
+    def __init__(self, topic_id, seed, question_ceiling, questions):
+        self.topic_id = topic_id
+        self.seed = seed
+        self.question_ceiling = question_ceiling
+        self.questions = questions
+
+    def __len__(self):
+        return len(self.questions)
+
+    def __repr__(self):
+        return (f"QuizInstance(topic_id={self.topic_id}, seed={self.seed}, "
+                f"question_ceiling={self.question_ceiling}, {len(self.questions)} questions)")
+
+
+def new_seed():
+    return random.SystemRandom().getrandbits(SEED_BITS)
+
+
+def _resolve_ranks(conn, topic_id, ceiling, ranks):
+    """Map ranks to ids, walking them in ascending order from the previous id"""
+    ids = {}
+    previous_rank, previous_id = -1, 0
+    for rank in sorted(ranks):
+        row = conn.execute(TOPIC_ALL_ID_AT_OFFSET,
+                           (topic_id, previous_id, ceiling, rank - previous_rank - 1)).fetchone()
+        if row is None:
+            break
+        ids[rank] = previous_id = row[0]
+        previous_rank = rank
+    return ids
+
+
+def _fetch_questions(conn, topic_id, ids):
+    """Active questions among ``ids`` by id; retired ones are left out"""
+    def load(missing):
+        placeholders = ",".join("?" * len(missing))
+        rows = conn.execute(
+            f"SELECT {QUESTION_COLUMNS} FROM quizzes q WHERE q.id IN ({placeholders}) AND q.retired=0",
+            missing
+        ).fetchall()
+        return {row[0]: Question.from_row(topic_id, row) for row in rows}
+    return question_cache.get_questions(conn, ids, load)
+
+
+def _sample_questions(conn, topic_id, ceiling, length, rng):
+    count = conn.execute(TOPIC_ALL_COUNT_UP_TO, (topic_id, ceiling)).fetchone()[0]
+    drawn = set()
+    chosen = []
+    # Each round draws one rank per open slot; retired picks leave their slot open
+    while len(chosen) < length and len(drawn) < count:
+        ranks = []
+        while len(ranks) < length - len(chosen) and len(drawn) < count:
+            rank = rng.randrange(count)
+            if rank not in drawn:
+                drawn.add(rank)
+                ranks.append(rank)
+        ids = _resolve_ranks(conn, topic_id, ceiling, ranks)
+        questions = _fetch_questions(conn, topic_id, list(ids.values()))
+        chosen.extend(questions[ids[rank]] for rank in ranks if ids.get(rank) in questions)
+    return chosen
+
+
+def _shuffled(question, seed):
+    order = list(range(len(question.options)))
+    random.Random(f"{seed}:{question.id}").shuffle(order)
+    options = tuple(question.options[i] for i in order)
+    correct_index = order.index(question.correct_index) if question.correct_index >= 0 else -1
+    return Question(question.id, question.topic_id, question.text, options,
+                    correct_index, question.question_type, tuple(order))
+
+
+def assemble_quiz(conn, topic_id, length=QUIZ_LENGTH, seed=None, question_ceiling=None):
+    """Draw a quiz instance; pass a stored seed and ceiling to rebuild one"""
+    if seed is None:
+        seed = new_seed()
+    if question_ceiling is None:
+        question_ceiling = conn.execute("SELECT MAX(id) FROM quizzes").fetchone()[0] or 0
+    questions = _sample_questions(conn, topic_id, question_ceiling, length, random.Random(seed))
+    questions = tuple(_shuffled(q, seed) for q in questions)
+    return QuizInstance(topic_id, seed, question_ceiling, questions)
+
+
+def replay_attempt(conn, attempt_id):
+    """Rebuild the quiz instance of a stored attempt; return ``(instance, answers)``
+
+    ``answers`` maps each quiz position to the chosen option's stored
+    position (``Question.positions`` maps it back to the shown index).
+    Returns None for attempts recorded before quiz seeds were stored.
+    """
+    row = conn.execute(
+        "SELECT topic_id, seed, question_ceiling, answers FROM quiz_attempts WHERE id=?",
+        (attempt_id,)
+    ).fetchone()
+    if row is None or row[1] is None:
+        return None
+    topic_id, seed, question_ceiling, answers_json = row
+    answers = json.loads(answers_json) if answers_json else {}
+    return assemble_quiz(conn, topic_id, seed=seed, question_ceiling=question_ceiling), answers
@@ -0,0 +1,85 @@
+"""Per-process cache of learning assistant answers
+
+Learners ask the same few questions in slightly different words, so
+answers are cached by the normalised question and the selected topic. Each
+entry also carries the content version it was computed from (the retrieval
+index key), and seeing a new version drops everything cached for the old
+one, so a knowledge-base or bank change is picked up on the next question.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+MAX_ENTRIES = 1024
+TTL_SECONDS = 3600
+
+PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_question(question):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(PUNCTUATION_RE.sub(" ", question.lower()).split())
+
+
+class ResponseCache:
+    """Thread-safe LRU with a time-to-live and hit/miss counters"""
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def _switch_version(self, version):
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def get(self, version, question, topic):
+        """Return the cached answer, or None on a miss"""
+        key = (normalize_question(question), topic)
+        with self._lock:
+            self._switch_version(version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, response = entry
+                if time.monotonic() - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return response
+                del self._entries[key]
+                self.expired += 1
+            self.misses += 1
+            return None
+
+    def put(self, version, question, topic, response):
+        key = (normalize_question(question), topic)
+        with self._lock:
+            self._switch_version(version)
+            self._entries[key] = (time.monotonic(), response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,281 @@
+"""BM25 passage retrieval for the learning assistants
+
+The knowledge base, ``topics.content`` and the active questions are split
+into short passages and indexed once with BM25. Postings are stored as flat
+NumPy arrays (term offsets, passage ids and precomputed term weights), so a
+query is a handful of vectorised adds followed by a partial sort.
+
+Indexes are saved under ``INDEX_DIR`` named by a fingerprint of their
+passages, so a worker that starts against unchanged content loads the
+arrays instead of re-tokenising, and any content change builds a new file.
+
+Usage: ``python retrieval.py QUESTION [database]``
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+import numpy as np
+
+from question_bank import bank_version
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = 'retrieval_index'
+INDEX_FORMAT = 1
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+# Passages from the topic selected in the UI get this score multiplier
+TOPIC_BOOST = 1.25
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it me of on or "
+    "should the this to use used what when which why with you your".split()
+)
+
+
+def tokenize(text):
+    """Lowercase word tokens with stopwords removed and plurals folded"""
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class Passage:
+    """A retrievable chunk of text and where it came from"""
+
+    __slots__ = ('source', 'topic', 'text')
+
+    def __init__(self, source, topic, text):
+        self.source = source
+        self.topic = topic
+        self.text = text
+
+    def __repr__(self):
+        return f"Passage({self.source!r}, {self.topic!r}, {self.text[:40]!r})"
+
+
+def knowledge_passages(knowledge_base):
+    """Split each knowledge-base category into its blank-line separated sections"""
+    passages = []
+    for topic, text in knowledge_base.items():
+        for block in re.split(r"\n\s*\n", text):
+            block = block.strip()
+            if block:
+                passages.append(Passage('knowledge', topic, block))
+    return passages
+
+
+def database_passages(conn):
+    """Topic descriptions and active authored questions with their answers"""
+    passages = []
+    for title, description, content in conn.execute(
+            "SELECT title, description, content FROM topics ORDER BY id"):
+        text = "\n".join(part for part in (description, content) if part)
+        if text:
+            passages.append(Passage('topic', title, text))
+    for title, question, answer in conn.execute('''
+            SELECT t.title, q.question, o.text
+            FROM quizzes q JOIN topics t ON t.id = q.topic_id
+            JOIN quiz_options o ON o.quiz_id = q.id AND o.position = q.correct_index
+            WHERE q.retired = 0 AND q.question_type != 'generated_numeric'
+            ORDER BY q.id'''):
+        passages.append(Passage('question', title, f"Practice question: {question}\nAnswer: {answer}"))
+    return passages
+
+
+def fingerprint(passages):
+    """Hash of the passages and index parameters, used to name saved indexes"""
+    digest = hashlib.sha256(f"{INDEX_FORMAT}:{K1}:{B}".encode())
+    for passage in passages:
+        digest.update(b"\0".join(
+            part.encode('utf-8') for part in (passage.source, passage.topic, passage.text)
+        ))
+        digest.update(b"\1")
+    return digest.hexdigest()
+
+
+class BM25Index:
+    """Immutable BM25 index over a list of passages"""
+
+    def __init__(self, passages, vocabulary, offsets, doc_ids, weights, key):
+        self.passages = passages
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.key = key
+        self.topics = sorted({p.topic for p in passages})
+        topic_ids = {topic: i for i, topic in enumerate(self.topics)}
+        self.passage_topics = np.fromiter((topic_ids[p.topic] for p in passages),
+                                          dtype=np.int32, count=len(passages))
+
+    @classmethod
+    def build(cls, passages, key=None):
+        """Tokenise ``passages`` and precompute every posting's BM25 weight"""
+        vocabulary = {}
+        doc_terms = []
+        lengths = np.zeros(len(passages), dtype=np.float32)
+        for doc, passage in enumerate(passages):
+            tokens = tokenize(passage.topic + " " + passage.text)
+            lengths[doc] = len(tokens)
+            counts = {}
+            for token in tokens:
+                term = vocabulary.setdefault(token, len(vocabulary))
+                counts[term] = counts.get(term, 0) + 1
+            doc_terms.append(counts)
+
+        term_col = np.fromiter((t for counts in doc_terms for t in counts), dtype=np.int32)
+        tf = np.fromiter((c for counts in doc_terms for c in counts.values()), dtype=np.float32)
+        doc_col = np.repeat(np.arange(len(passages), dtype=np.int32),
+                            [len(counts) for counts in doc_terms])
+
+        # Group postings by term
+        order = np.argsort(term_col, kind='stable')
+        term_col, doc_col, tf = term_col[order], doc_col[order], tf[order]
+        df = np.bincount(term_col, minlength=len(vocabulary))
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(df, out=offsets[1:])
+
+        n_docs = max(len(passages), 1)
+        avg_length = float(lengths.mean()) if len(passages) else 1.0
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = K1 * (1 - B + B * lengths[doc_col] / max(avg_length, 1.0))
+        weights = idf[term_col] * tf * (K1 + 1) / (tf + norm)
+
+        return cls(passages, vocabulary, offsets, doc_col, weights.astype(np.float32),
+                   key or fingerprint(passages))
+
+    def search(self, question, k=3, topic=None):
+        """Return up to ``k`` ``(passage, score)`` pairs, best first"""
+        terms = {self.vocabulary[t] for t in tokenize(question) if t in self.vocabulary}
+        if not terms:
+            return []
+        scores = np.zeros(len(self.passages), dtype=np.float32)
+        for term in terms:
+            start, end = self.offsets[term], self.offsets[term + 1]
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+        if topic in self.topics:
+            scores[self.passage_topics == self.topics.index(topic)] *= TOPIC_BOOST
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(scores[matched], -k)[-k:]]
+        matched = matched[np.argsort(-scores[matched], kind='stable')]
+        return [(self.passages[i], float(scores[i])) for i in matched]
+
+    def save(self, path):
+        """Write the index to ``path`` atomically"""
+        meta = json.dumps({
+            'key': self.key,
+            'vocabulary': sorted(self.vocabulary, key=self.vocabulary.get),
+            'passages': [[p.source, p.topic, p.text] for p in self.passages],
+        })
+        buffer = io.BytesIO()
+        np.savez(buffer, meta=np.array(meta), offsets=self.offsets,
+                 doc_ids=self.doc_ids, weights=self.weights)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(buffer.getvalue())
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta'][()]))
+            vocabulary = {term: i for i, term in enumerate(meta['vocabulary'])}
+            passages = [Passage(*fields) for fields in meta['passages']]
+            return cls(passages, vocabulary, data['offsets'], data['doc_ids'],
+                       data['weights'], meta['key'])
+
+
+def load_or_build(passages, index_dir=INDEX_DIR):
+    """Load the saved index for these passages, building and saving it if missing"""
+    key = fingerprint(passages)
+    path = os.path.join(index_dir, f"bm25-{key[:16]}.npz")
+    start = time.perf_counter()
+    if os.path.exists(path):
+        try:
+            index = BM25Index.load(path)
+            if index.key == key:
+                logger.info("Loaded retrieval index %s in %.1f ms",
+                            path, (time.perf_counter() - start) * 1000)
+                return index
+        except (OSError, ValueError, KeyError):
+            logger.warning("Rebuilding unreadable retrieval index %s", path)
+    index = BM25Index.build(passages, key)
+    try:
+        index.save(path)
+    except OSError:
+        logger.warning("Could not save retrieval index to %s", path)
+    logger.info("Built retrieval index over %d passages in %.1f ms",
+                len(passages), (time.perf_counter() - start) * 1000)
+    return index
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(conn, knowledge_base):
+    """Return the process-wide index for a knowledge base and the current bank"""
+    key = (knowledge_base.version, bank_version(conn))
+    index = _indexes.get(key)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(key)
+            if index is None:
+                passages = knowledge_passages(knowledge_base) + database_passages(conn)
+                index = load_or_build(passages)
+                # Superseded content is never asked for again
+                _indexes.clear()
+                _indexes[key] = index
+    return index
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print(__doc__.strip().splitlines()[-1])
+        return 2
+
+    import sqlite3
+    from database import DB_PATH, configure_connection
+    from knowledge_base import get_knowledge_base
+    from migrations import ensure_schema
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    conn = configure_connection(sqlite3.connect(argv[1] if len(argv) > 1 else DB_PATH))
+    ensure_schema(conn)
+    index = get_index(conn, get_knowledge_base())
+    conn.close()
+
+    for passage, score in index.search(argv[0]):
+        print(f"[{score:.2f}] {passage.topic} ({passage.source})\n{passage.text}\n")
+    rounds = 2000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        index.search(argv[0])
+    print(f"{(time.perf_counter() - start) / rounds * 1e6:.0f} us per query "
+          f"over {len(index.passages)} passages")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
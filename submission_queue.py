@@ -0,0 +1,197 @@
+"""Write-behind queue that batches quiz submissions into one transaction
+
+On exam days many learners submit within seconds. Instead of every
+request taking SQLite's writer lock and committing on its own, submissions
+are handed to a single background writer that commits them in batches
+(every ``flush_interval_ms`` or ``max_batch`` records, whichever comes
+first). A submission that arrives while the writer is idle is committed
+at once rather than waiting out the window. ``submit`` returns a ticket
+whose ``wait`` only returns once the batch holding it has been committed.
+
+If a batch fails, its records are retried one transaction each, so a bad
+record fails only its own ticket and the writer keeps running.
+"""
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from database import DB_PATH, TimingStats, configure_connection
+from progress import QUIZ_MODE, record_attempt
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_MS = 50
+MAX_BATCH = 200
+
+
+class Submission:
+    """A queued attempt and its durable-acknowledgment handle"""
+
+    __slots__ = ('user_id', 'topic_id', 'score', 'answers', 'timestamp', 'seed',
+                 'question_ceiling', 'mode', 'error', '_done')
+
+    def __init__(self, user_id, topic_id, score, answers=None, timestamp=None,
+                 seed=None, question_ceiling=None, mode=QUIZ_MODE):
+        self.user_id = user_id
+        self.topic_id = topic_id
+        self.score = score
+        self.answers = answers
+        self.timestamp = timestamp if timestamp is not None else datetime.now()
+        self.seed = seed
+        self.question_ceiling = question_ceiling
+        self.mode = mode
+        self.error = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """Block until the submission is committed; raise if it failed"""
+        if not self._done.wait(timeout):
+            raise TimeoutError("Submission was not written in time")
+        if self.error is not None:
+            raise self.error
+        return True
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+
+class SubmissionWriter:
+    """Single background thread that owns the write connection"""
+
+    def __init__(self, path=DB_PATH, flush_interval_ms=FLUSH_INTERVAL_MS, max_batch=MAX_BATCH):
+        self.path = path
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self.batch_stats = TimingStats()
+        self.records_written = 0
+        self._queue = queue.Queue()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="submission-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, user_id, topic_id, score, answers=None, seed=None, question_ceiling=None,
+               mode=QUIZ_MODE):
+        """Queue an attempt; call ``wait()`` on the result for the acknowledgment"""
+        if self._stopping.is_set():
+            raise RuntimeError("Submission writer is closed")
+        submission = Submission(user_id, topic_id, score, answers,
+                                seed=seed, question_ceiling=question_ceiling, mode=mode)
+        self._queue.put(submission)
+        return submission
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far has been committed"""
+        marker = Submission(None, None, None)
+        self._queue.put(marker)
+        marker._done.wait(timeout)
+
+    def close(self, timeout=10):
+        """Flush outstanding submissions and stop the writer thread"""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self):
+        """Return batch timings and the number of records written"""
+        return {'records': self.records_written, 'batches': self.batch_stats.snapshot()}
+
+    def _collect(self, first):
+        batch = [first]
+        # A lone submission on an idle writer has nothing to share a commit with
+        if self._queue.empty():
+            return batch
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _commit(self, conn, records):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for item in records:
+                record_attempt(cursor, item.user_id, item.topic_id, item.score,
+                               item.answers, item.timestamp, item.seed, item.question_ceiling, item.mode)
+            conn.commit()
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        self.records_written += len(records)
+
+    def _write(self, conn, batch):
+        records = [item for item in batch if item.user_id is not None]
+        start = time.perf_counter()
+        try:
+            if records:
+                try:
+                    self._commit(conn, records)
+                except Exception:
+                    logger.exception("Failed to write %d submissions; retrying one at a time", len(records))
+                    # Retry singly so one bad record does not fail the rest
+                    for item in records:
+                        try:
+                            self._commit(conn, [item])
+                        except Exception as exc:
+                            logger.error("Dropped submission for user %s, topic %s: %s",
+                                         item.user_id, item.topic_id, exc)
+                            item.error = exc
+                self.batch_stats.record((time.perf_counter() - start) * 1000)
+        finally:
+            for item in batch:
+                item._done.set()
+
+    def _run(self):
+        conn = configure_connection(sqlite3.connect(self.path))
+        try:
+            while True:
+                first = self._queue.get()
+                if first is None:
+                    break
+                self._write(conn, self._collect(first))
+            # Drain anything submitted before close()
+            leftover = []
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    leftover.append(item)
+            if leftover:
+                self._write(conn, leftover)
+        finally:
+            conn.close()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_submission_writer(path=DB_PATH):
+    """Return the process-wide writer, flushed automatically at exit"""
+    global _writer
+    with _writer_lock:
+        if _writer is None or _writer.path != path:
+            if _writer is not None:
+                _writer.close()
+            _writer = SubmissionWriter(path)
+            atexit.register(_writer.close)
+        return _writer